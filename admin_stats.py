@@ -0,0 +1,107 @@
+from collections import Counter
+from supabase_client import is_missing_function, is_missing_relation
+
+
+STAT_COUNTERS = ("invites", "rsvp_yes", "rsvp_no", "surveys", "opt_ins", "passports_confirmed")
+
+
+def counts_to_rows(counter, by_value=False):
+    items = sorted(counter.items()) if by_value else counter.most_common()
+    return [{"value": value, "count": count} for value, count in items]
+
+
+def split_choices(raw):
+    return [item for item in (raw or "").split(", ") if item]
+
+
+def aggregate_stats(invites, surveys):
+    rsvp = Counter((row.get("rsvp_choice") or "pending") for row in invites)
+    liquor = Counter()
+    events = Counter()
+    arrival = Counter()
+    budget = Counter()
+    likelihood = Counter()
+    opt_ins = 0
+    passports = 0
+    for row in surveys:
+        liquor.update(split_choices(row.get("liquor_preferences")))
+        events.update(split_choices(row.get("event_preferences")))
+        arrival[row.get("arrival_window") or "Unknown"] += 1
+        budget[row.get("budget_preference") or "Unknown"] += 1
+        likelihood[row.get("attendance_likelihood") or 0] += 1
+        opt_ins += row.get("notify_opt_in") is True
+        passports += bool(row.get("passport_confirmed"))
+    return {
+        "invites": len(invites),
+        "rsvp_yes": rsvp.get("yes", 0),
+        "rsvp_no": rsvp.get("no", 0),
+        "surveys": len(surveys),
+        "opt_ins": opt_ins,
+        "passports_confirmed": passports,
+        "rsvp_counts": counts_to_rows(rsvp),
+        "liquor": counts_to_rows(liquor),
+        "events": counts_to_rows(events),
+        "arrival": counts_to_rows(arrival),
+        "budget": counts_to_rows(budget),
+        "likelihood": counts_to_rows(likelihood, by_value=True),
+    }
+
+
+def load_dashboard_stats(supabase):
+    try:
+        res = supabase.rpc("admin_dashboard_stats", {}).execute()
+        if isinstance(res.data, dict):
+            return res.data
+    except Exception as exc:
+        if not is_missing_function(exc):
+            raise
+    invites = supabase.table("invites").select("rsvp_choice").execute().data or []
+    surveys = (
+        supabase.table("survey_responses")
+        .select(
+            "liquor_preferences, event_preferences, arrival_window, budget_preference, "
+            "attendance_likelihood, notify_opt_in, passport_confirmed"
+        )
+        .execute()
+        .data
+        or []
+    )
+    return aggregate_stats(invites, surveys)
+
+
+def attendance_counts(row):
+    counts = {name: int(row.get(name) or 0) for name in STAT_COUNTERS}
+    counts["rsvp_pending"] = max(counts["invites"] - counts["rsvp_yes"] - counts["rsvp_no"], 0)
+    counts["version"] = row.get("version")
+    counts["updated_at"] = row.get("updated_at")
+    return counts
+
+
+def fallback_counts(supabase):
+    stats = load_dashboard_stats(supabase)
+    counts = attendance_counts(stats)
+    counts["stats"] = stats
+    return counts
+
+
+def load_invite_stats(supabase):
+    try:
+        rows = supabase.table("invite_stats").select("*").eq("id", 1).limit(1).execute().data or []
+    except Exception as exc:
+        if not is_missing_relation(exc):
+            raise
+        return fallback_counts(supabase)
+    if not rows:
+        return rebuild_invite_stats(supabase)
+    return attendance_counts(rows[0])
+
+
+def rebuild_invite_stats(supabase):
+    try:
+        res = supabase.rpc("rebuild_invite_stats", {}).execute()
+    except Exception as exc:
+        if not is_missing_function(exc):
+            raise
+        return fallback_counts(supabase)
+    row = res.data[0] if isinstance(res.data, list) and res.data else res.data
+    return attendance_counts(row if isinstance(row, dict) else {})
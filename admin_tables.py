@@ -0,0 +1,99 @@
+from supabase_client import is_missing_relation
+
+
+ADMIN_PAGE_SIZE = 50
+CHOICE_COLUMNS = {"liquor": "liquor_preferences", "events": "event_preferences"}
+
+
+def clean_search(search):
+    return "".join(ch for ch in (search or "").strip() if ch not in '%*,()"\\')
+
+
+def cursor_filter(cursor, key_column):
+    created_at, key = cursor
+    return (
+        f'created_at.lt."{created_at}",'
+        f'and(created_at.eq."{created_at}",{key_column}.lt."{key}")'
+    )
+
+
+def fetch_page(query, key_column, cursor=None, page_size=ADMIN_PAGE_SIZE):
+    query = query.order("created_at", desc=True).order(key_column, desc=True)
+    if cursor:
+        query = query.or_(cursor_filter(cursor, key_column))
+    rows = query.limit(page_size + 1).execute().data or []
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = (rows[-1]["created_at"], rows[-1][key_column])
+    return rows, next_cursor
+
+
+def invites_query(supabase, rsvp=None, survey_done=None, search=""):
+    query = supabase.table("invites").select("*")
+    if rsvp == "pending":
+        query = query.is_("rsvp_choice", "null")
+    elif rsvp:
+        query = query.eq("rsvp_choice", rsvp)
+    if survey_done is not None:
+        query = query.eq("survey_done", survey_done)
+    search = clean_search(search)
+    if search:
+        query = query.ilike("guest_name", f"%{search}%")
+    return query
+
+
+def survey_query(supabase, passport_confirmed=None, notify_opt_in=None, search=""):
+    search = clean_search(search)
+    columns = "*, invites!inner(guest_name)" if search else "*, invites(guest_name)"
+    query = supabase.table("survey_responses").select(columns)
+    if passport_confirmed is not None:
+        query = query.eq("passport_confirmed", passport_confirmed)
+    if notify_opt_in is not None:
+        query = query.eq("notify_opt_in", notify_opt_in)
+    if search:
+        query = query.ilike("invites.guest_name", f"%{search}%")
+    return query
+
+
+def fetch_invites_page(supabase, cursor=None, page_size=ADMIN_PAGE_SIZE, **filters):
+    return fetch_page(invites_query(supabase, **filters), "token", cursor, page_size)
+
+
+def fetch_survey_page(supabase, cursor=None, page_size=ADMIN_PAGE_SIZE, **filters):
+    rows, next_cursor = fetch_page(survey_query(supabase, **filters), "id", cursor, page_size)
+    for row in rows:
+        invite = row.pop("invites", None) or {}
+        row["guest_name"] = invite.get("guest_name")
+    return rows, next_cursor
+
+
+def fetch_choice_guests(supabase, question, choice):
+    try:
+        rows = (
+            supabase.table("survey_choices")
+            .select("token, invites(guest_name)")
+            .eq("question", question)
+            .eq("choice", choice)
+            .execute()
+            .data
+            or []
+        )
+    except Exception as exc:
+        if not is_missing_relation(exc):
+            raise
+        column = CHOICE_COLUMNS[question]
+        rows = (
+            supabase.table("survey_responses")
+            .select(f"token, {column}, invites(guest_name)")
+            .ilike(column, f"%{clean_search(choice)}%")
+            .execute()
+            .data
+            or []
+        )
+        rows = [row for row in rows if choice in (row.get(column) or "").split(", ")]
+    guests = {}
+    for row in rows:
+        invite = row.get("invites") or {}
+        guests[row["token"]] = invite.get("guest_name") or row["token"]
+    return sorted(guests.values())
@@ -1,3 +1,5 @@
+import json
+import logging
 import os
 import re
 from datetime import datetime, date, time, timedelta
@@ -5,9 +7,23 @@ import pandas as pd
 import altair as alt
 import streamlit as st
 import streamlit.components.v1 as components
-import requests
-from requests.auth import HTTPBasicAuth
-from supabase_client import get_supabase_client
+from admin_stats import load_dashboard_stats, load_invite_stats, rebuild_invite_stats
+from admin_tables import fetch_choice_guests, fetch_invites_page, fetch_survey_page
+from cache import TTLCache, VersionedCache
+from calendar_feed import CalendarFeedServer, FeedCache
+from event_log import EventLogWriter
+from exports import csv_export, iter_pages, parquet_export
+from gallery import caption_from_filename, load_manifest, picture_html, schedule_derivatives
+from invite_guard import AttemptLimiter, KnownTokens
+from media import image_html, resolve_media, video_html
+from metrics import METRICS, SectionTimer, timed
+from outbox import OutboxWorker, enqueue_emails
+from supabase_client import (
+    get_supabase_client,
+    is_missing_function,
+    is_missing_relation,
+    mark_supabase_failed,
+)
 
 
 APP_TITLE = "Costa Rica Trip"
@@ -20,6 +36,7 @@ EVENT_START_TIME = time(19, 0)
 ALLOW_RSVP_REDO = False
 GALLERY_DIR = "assets/gallery"
 GALLERY_URLS = []
+GALLERY_PAGE_SIZE = 12
 DEFAULT_ORIGIN = "NYC"
 PASSPORT_STANDARD_WEEKS = 13
 PASSPORT_EXPEDITED_WEEKS = 7
@@ -28,6 +45,22 @@ WEATHER_AVG_LOW_F = 70
 WEATHER_NOTE = "June is warm and humid with afternoon showers."
 ADMIN_LINK_PARAM = "admin"
 AUTO_REFRESH_SECONDS = 60
+AUTO_REFRESH_MODE = "fragment"
+INVITE_CACHE_TTL_SECONDS = 30
+INVITE_CACHE_MAX_ENTRIES = 512
+INVITE_MISS_CACHE_TTL_SECONDS = 300
+INVITE_MISS_CACHE_MAX_ENTRIES = 4096
+TOKEN_SET_REFRESH_SECONDS = 300
+TOKEN_SET_RECHECK_SECONDS = 15
+ENTER_ATTEMPTS_PER_WINDOW = 10
+ENTER_ATTEMPT_WINDOW_SECONDS = 60
+EVENTS_CACHE_MAX_AGE_SECONDS = 300
+CALENDAR_CACHE_MAX_ENTRIES = 16
+EVENT_LOG_BATCH_SIZE = 50
+EVENT_LOG_FLUSH_SECONDS = 2.0
+EVENT_LOG_MAX_PENDING = 5000
+ADMIN_CHART_CACHE_TTL_SECONDS = 3600
+ADMIN_CHART_CACHE_MAX_ENTRIES = 32
 AVG_PRICE_ORIGINS = {
     "Nashville (BNA)": 520,
     "Washington DC (WAS)": 540,
@@ -174,25 +207,156 @@ def is_admin_request():
     return provided == admin_token
 
 
+@st.cache_resource(show_spinner=False)
+def get_invite_cache():
+    return TTLCache(INVITE_CACHE_TTL_SECONDS, INVITE_CACHE_MAX_ENTRIES)
+
+
+@st.cache_resource(show_spinner=False)
+def get_invite_miss_cache():
+    return TTLCache(INVITE_MISS_CACHE_TTL_SECONDS, INVITE_MISS_CACHE_MAX_ENTRIES)
+
+
+@st.cache_resource(show_spinner=False)
+def get_known_tokens():
+    return KnownTokens(TOKEN_SET_REFRESH_SECONDS, TOKEN_SET_RECHECK_SECONDS)
+
+
+@st.cache_resource(show_spinner=False)
+def get_enter_limiter():
+    return AttemptLimiter(ENTER_ATTEMPTS_PER_WINDOW, ENTER_ATTEMPT_WINDOW_SECONDS)
+
+
+def client_key():
+    header = st.secrets.get("CLIENT_IP_HEADER", os.environ.get("CLIENT_IP_HEADER"))
+    if header:
+        forwarded = st.context.headers.get(header)
+        if isinstance(forwarded, str) and forwarded.strip():
+            return forwarded.split(",")[-1].strip()
+    session_key = st.session_state.setdefault("client_key", os.urandom(8).hex())
+    ip_address = st.context.ip_address
+    if isinstance(ip_address, str) and ip_address:
+        return f"{ip_address}/{session_key}"
+    return session_key
+
+
+def allow_enter_attempt():
+    if get_enter_limiter().allow(client_key()):
+        return True
+    st.error("Too many attempts. Please wait a minute and try again.")
+    return False
+
+
 def load_invite(supabase, token):
+    cache = get_invite_cache()
+    cached = cache.get(token)
+    if cached:
+        return cached
+    misses = get_invite_miss_cache()
+    known = get_known_tokens().check(supabase, token)
+    if known is False or (known is None and misses.get(token)):
+        misses.put(token, {"missing": True})
+        return None
     try:
         res = supabase.table("invites").select("*").eq("token", token).limit(1).execute()
     except Exception:
+        mark_supabase_failed()
         return None
     if res.data:
+        cache.put(token, res.data[0])
+        misses.evict(token)
+        get_known_tokens().add(token)
         return res.data[0]
+    misses.put(token, {"missing": True})
     return None
 
 
 def update_invite(supabase, token, payload):
     payload["updated_at"] = datetime.utcnow().isoformat()
-    supabase.table("invites").update(payload).eq("token", token).execute()
+    cache = get_invite_cache()
+    try:
+        supabase.table("invites").update(payload).eq("token", token).execute()
+    except Exception:
+        cache.evict(token)
+        raise
+    cache.update(token, payload)
+
+
+def apply_transition_locally(supabase, token, changes, event_type=None, detail="", survey=None):
+    if survey is not None:
+        supabase.table("survey_responses").insert({"token": token, **survey}).execute()
+    update_invite(supabase, token, dict(changes))
+    if event_type:
+        log_event(supabase, token, event_type, detail)
+
+
+def apply_transition(supabase, token, changes, event_type=None, detail="", survey=None):
+    cache = get_invite_cache()
+    try:
+        res = supabase.rpc(
+            "apply_invite_transition",
+            {
+                "p_token": token,
+                "p_changes": changes,
+                "p_event_type": event_type,
+                "p_detail": detail,
+                "p_survey": survey,
+            },
+        ).execute()
+    except Exception as exc:
+        if not is_missing_function(exc):
+            cache.evict(token)
+            raise
+        apply_transition_locally(supabase, token, changes, event_type, detail, survey)
+        return
+    row = res.data[0] if isinstance(res.data, list) and res.data else res.data
+    if isinstance(row, dict) and row.get("token"):
+        cache.put(token, row)
+    else:
+        cache.evict(token)
+
+
+@st.cache_resource(show_spinner=False)
+def get_event_log_writer():
+    return EventLogWriter(
+        "invite_events",
+        batch_size=EVENT_LOG_BATCH_SIZE,
+        flush_seconds=EVENT_LOG_FLUSH_SECONDS,
+        max_pending=EVENT_LOG_MAX_PENDING,
+    )
 
 
 def log_event(supabase, token, event_type, detail=""):
-    supabase.table("invite_events").insert(
-        {"token": token, "event_type": event_type, "detail": detail}
-    ).execute()
+    get_event_log_writer().submit(
+        supabase,
+        {
+            "token": token,
+            "event_type": event_type,
+            "detail": detail,
+            "created_at": datetime.utcnow().isoformat(),
+        },
+    )
+
+
+def render_invite_media(video_url):
+    media = resolve_media(video_url)
+    is_image = media["kind"] == "image"
+    st.subheader("Your Photo Message" if is_image else "Your Video Message")
+    st.markdown("<div class='video-frame'>", unsafe_allow_html=True)
+    if media["missing"]:
+        st.warning("Media file not found. Check the file path.")
+    elif media["remote"] or not media["url"]:
+        source = media["url"] or media["path"]
+        if is_image:
+            st.image(source, use_container_width=True)
+        else:
+            st.video(source, format=media["mime"], start_time=0)
+    elif is_image:
+        st.markdown(image_html(media["url"]), unsafe_allow_html=True)
+    else:
+        st.markdown(video_html(media["url"], media["poster"], media["mime"]), unsafe_allow_html=True)
+    st.markdown("</div>", unsafe_allow_html=True)
+    return media
 
 
 def blackout_screen(message):
@@ -208,12 +372,12 @@ def blackout_screen(message):
     st.markdown(f"<div class='blackout'>{message}</div>", unsafe_allow_html=True)
 
 
-def ics_payload(extra_events=None):
+def iter_ics(extra_events=None, dtstamp=None):
     start_dt = datetime.combine(EVENT_START_DATE, EVENT_START_TIME)
     end_dt = datetime.combine(EVENT_END_DATE, EVENT_START_TIME)
-    dtstamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    dtstamp = dtstamp or datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
     uid = f"{EVENT_NAME.replace(' ', '')}-{start_dt.strftime('%Y%m%d')}@invite"
-    ics = (
+    yield (
         "BEGIN:VCALENDAR\n"
         "VERSION:2.0\n"
         "PRODID:-//Birthday Invite//EN\n"
@@ -239,7 +403,7 @@ def ics_payload(extra_events=None):
         event_uid = f"{event.get('id', 'event')}-{event_start.strftime('%Y%m%d')}@invite"
         title = event.get("title") or "Trip Event"
         location = event.get("location") or DEST_CITY
-        ics += (
+        yield (
             "BEGIN:VEVENT\n"
             f"UID:{event_uid}\n"
             f"DTSTAMP:{dtstamp}\n"
@@ -248,8 +412,57 @@ def ics_payload(extra_events=None):
             f"LOCATION:{location}\n"
             "END:VEVENT\n"
         )
-    ics += "END:VCALENDAR\n"
-    return ics
+    yield "END:VCALENDAR\n"
+
+
+def ics_payload(extra_events=None):
+    return "".join(iter_ics(extra_events))
+
+
+@st.cache_resource(show_spinner=False)
+def get_calendar_cache():
+    return FeedCache(CALENDAR_CACHE_MAX_ENTRIES)
+
+
+def calendar_feed(supabase, upcoming=False):
+    version, events = load_events_versioned(supabase)
+    today = date.today().isoformat()
+    if upcoming:
+        events = [event for event in events if str(event.get("event_date") or "") >= today]
+    key = (version, today if upcoming else None)
+    return get_calendar_cache().get(key, lambda: iter_ics(events))
+
+
+def load_calendar_for_token(token, upcoming):
+    supabase = get_supabase_client()
+    if not is_valid_token(token) or not load_invite(supabase, token):
+        return None
+    return calendar_feed(supabase, upcoming)
+
+
+def load_attendance(params):
+    admin_token = st.secrets.get("ADMIN_LINK_TOKEN", os.environ.get("ADMIN_LINK_TOKEN"))
+    if not admin_token or params.get(ADMIN_LINK_PARAM, [None])[0] != admin_token:
+        return None
+    counts = load_invite_stats(get_supabase_client())
+    counts.pop("stats", None)
+    return json.dumps(counts).encode("utf-8")
+
+
+@st.cache_resource(show_spinner=False)
+def start_calendar_feed_server(port):
+    try:
+        return CalendarFeedServer(port, load_calendar_for_token, attendance_loader=load_attendance)
+    except OSError as exc:
+        logging.getLogger("calendar_feed").warning("Calendar feed disabled, cannot bind port %s: %s", port, exc)
+        return None
+
+
+def calendar_feed_url(token):
+    base_url = st.secrets.get("CALENDAR_FEED_BASE_URL", os.environ.get("CALENDAR_FEED_BASE_URL"))
+    if not base_url:
+        return None
+    return f"{base_url.rstrip('/')}/calendar/{token}.ics"
 
 
 def flights_link(home_city):
@@ -277,25 +490,27 @@ def flights_embed(home_city):
     )
 
 
-def get_gallery_images():
-    images = []
-    if os.path.isdir(GALLERY_DIR):
-        for name in sorted(os.listdir(GALLERY_DIR)):
-            lower = name.lower()
-            if lower.endswith((".jpg", ".jpeg", ".png", ".webp")):
-                images.append(os.path.join(GALLERY_DIR, name))
-    images.extend(GALLERY_URLS)
-    return images
+def get_gallery_manifest():
+    return load_manifest(GALLERY_DIR, GALLERY_URLS)
 
 
-def pick_images_by_keyword(images, keyword, limit=2):
-    matches = [img for img in images if keyword in os.path.basename(img).lower()]
-    return matches[:limit]
+def pick_images_by_keyword(manifest, keyword, limit=2):
+    return manifest["by_tag"].get(keyword.lower(), [])[:limit]
 
 
-def caption_from_filename(path):
-    name = os.path.splitext(os.path.basename(path))[0]
-    return name.replace("_", " ").replace("-", " ").title()
+def render_gallery_image(container, image, sizes, caption=None):
+    caption = caption or caption_from_filename(image)
+    if image.startswith(("http://", "https://")):
+        container.image(image, use_container_width=True, caption=caption)
+        return
+    try:
+        derivatives = schedule_derivatives(image)
+    except OSError:
+        derivatives = None
+    if derivatives is None:
+        container.image(image, use_container_width=True, caption=caption)
+        return
+    container.markdown(picture_html(derivatives, caption, sizes), unsafe_allow_html=True)
 
 
 def passport_timeline():
@@ -371,6 +586,8 @@ def weather_section():
 
 
 def auto_refresh():
+    if AUTO_REFRESH_MODE != "page":
+        return
     components.html(
         f"""
         <script>
@@ -390,7 +607,12 @@ def parse_items(raw_items):
     return [item for item in lines if item]
 
 
-def load_events(supabase):
+@st.cache_resource(show_spinner=False)
+def get_events_cache():
+    return VersionedCache(EVENTS_CACHE_MAX_AGE_SECONDS)
+
+
+def fetch_events(supabase):
     res = (
         supabase.table("trip_events")
         .select("*")
@@ -401,6 +623,19 @@ def load_events(supabase):
     return res.data or []
 
 
+def load_events_versioned(supabase):
+    return get_events_cache().get(lambda: fetch_events(supabase))
+
+
+def load_events(supabase):
+    _, events = load_events_versioned(supabase)
+    return events
+
+
+def bump_events_version():
+    return get_events_cache().bump()
+
+
 def load_latest_survey(supabase, token):
     res = (
         supabase.table("survey_responses")
@@ -442,50 +677,77 @@ def format_event_line(event):
     return f"{date_text} - " + " · ".join(pieces)
 
 
-def send_bulk_email(recipients, subject, content):
+def get_mailgun_settings():
     api_key = st.secrets.get("MAILGUN_API_KEY", os.environ.get("MAILGUN_API_KEY"))
     domain = st.secrets.get("MAILGUN_DOMAIN", os.environ.get("MAILGUN_DOMAIN"))
     from_email = st.secrets.get("MAILGUN_FROM_EMAIL", os.environ.get("MAILGUN_FROM_EMAIL"))
+    api_base = st.secrets.get("MAILGUN_API_BASE", os.environ.get("MAILGUN_API_BASE"))
     if not api_key or not domain or not from_email:
+        return None
+    return {"api_key": api_key, "domain": domain, "from_email": from_email, "api_base": api_base}
+
+
+@st.cache_resource(show_spinner=False)
+def get_outbox_worker():
+    return OutboxWorker()
+
+
+def start_outbox_worker(supabase):
+    worker = get_outbox_worker()
+    worker.configure(supabase, get_mailgun_settings())
+    return worker
+
+
+def send_bulk_email(supabase, recipients, subject, content, message_key):
+    if not get_mailgun_settings():
         st.error("Missing Mailgun settings. Set MAILGUN_API_KEY, MAILGUN_DOMAIN, and MAILGUN_FROM_EMAIL.")
-        return False
+        return 0
 
     if not recipients:
         st.warning("No guests have opted in for email updates.")
-        return False
-
-    for email in recipients:
-        response = requests.post(
-            f"https://api.mailgun.net/v3/{domain}/messages",
-            auth=HTTPBasicAuth("api", api_key),
-            data={
-                "from": from_email,
-                "to": email,
-                "subject": subject,
-                "text": content,
-            },
-            timeout=20,
-        )
-        if response.status_code >= 400:
-            st.error(f"Mailgun error for {email}: {response.text}")
-            return False
-    return True
+        return 0
+
+    queued = enqueue_emails(supabase, recipients, subject, content, message_key)
+    if not queued:
+        st.info("All recipients were already sent this email. Nothing new was queued.")
+        return 0
+    start_outbox_worker(supabase).notify()
+    return queued
+
+
+def latest_opt_in_emails(rows):
+    seen_tokens = set()
+    emails = []
+    for row in rows:
+        email = (row.get("email") or "").strip().lower()
+        if not email or row.get("token") in seen_tokens:
+            continue
+        seen_tokens.add(row.get("token"))
+        if row.get("notify_opt_in") and email not in emails:
+            emails.append(email)
+    return emails
 
 
 def get_opted_in_emails(supabase):
-    opted = (
+    try:
+        res = supabase.table("notification_recipients").select("email").execute()
+        return [row["email"] for row in (res.data or []) if row.get("email")]
+    except Exception as exc:
+        if not is_missing_relation(exc):
+            raise
+    rows = (
         supabase.table("survey_responses")
-        .select("email, notify_opt_in")
-        .eq("notify_opt_in", True)
+        .select("token, email, notify_opt_in, created_at")
+        .order("created_at", desc=True)
         .execute()
     )
-    return [row.get("email") for row in (opted.data or []) if row.get("email")]
+    return latest_opt_in_emails(rows.data or [])
 
 
-def send_event_reminders(recipients, events):
+def send_event_reminders(supabase, recipients, events):
     if not events:
         st.warning("No upcoming events to notify.")
-        return False
+        return 0
 
     subject = f"{EVENT_NAME} update: events tomorrow"
     event_lines = "\n".join([format_event_line(event) for event in events])
@@ -494,10 +756,11 @@ def send_event_reminders(recipients, events):
         f"{event_lines}\n\n"
         "See you there!"
     )
-    return send_bulk_email(recipients, subject, content)
+    event_ids = ",".join(sorted(str(event.get("id")) for event in events))
+    return send_bulk_email(supabase, recipients, subject, content, f"event-reminder:{event_ids}")
 
 
-def send_passport_deadline_reminder(recipients):
+def send_passport_deadline_reminder(supabase, recipients):
     standard_deadline = EVENT_START_DATE - timedelta(weeks=PASSPORT_STANDARD_WEEKS)
     subject = f"Passport reminder: {EVENT_NAME}"
     content = (
@@ -507,126 +770,250 @@ def send_passport_deadline_reminder(recipients):
         "Passport info: https://travel.state.gov/content/travel/en/passports/how-apply.html\n\n"
         "See you soon!"
     )
-    return send_bulk_email(recipients, subject, content)
+    message_key = f"passport-deadline:{standard_deadline.isoformat()}"
+    return send_bulk_email(supabase, recipients, subject, content, message_key)
 
 
-def admin_dashboard(supabase):
-    st.subheader("Admin Dashboard")
-    invites_res = supabase.table("invites").select("*").execute()
-    survey_res = supabase.table("survey_responses").select("*").execute()
+def yes_no_filter(label, key):
+    choice = st.selectbox(label, ["All", "Yes", "No"], key=key)
+    return None if choice == "All" else choice == "Yes"
+
+
+def render_paged_table(name, filters, fetch):
+    state_key = f"{name}_pages"
+    pages = st.session_state.get(state_key)
+    if not pages or pages["filters"] != filters:
+        pages = {"filters": filters, "cursors": [None]}
+        st.session_state[state_key] = pages
+    rows, next_cursor = fetch(pages["cursors"][-1])
+    if rows:
+        st.dataframe(pd.DataFrame(rows), use_container_width=True)
+    else:
+        st.info("No matching rows.")
+    nav_cols = st.columns([1, 1, 4])
+    if nav_cols[0].button("Previous", key=f"{name}_prev", disabled=len(pages["cursors"]) == 1):
+        pages["cursors"].pop()
+        st.rerun()
+    if nav_cols[1].button("Next", key=f"{name}_next", disabled=next_cursor is None):
+        pages["cursors"].append(next_cursor)
+        st.rerun()
+    nav_cols[2].caption(f"Page {len(pages['cursors'])}")
+
+
+def render_invites_table(supabase):
+    filter_cols = st.columns(3)
+    rsvp = filter_cols[0].selectbox("RSVP", ["All", "yes", "no", "pending"], key="invites_rsvp")
+    with filter_cols[1]:
+        survey_done = yes_no_filter("Survey done", "invites_survey_done")
+    search = filter_cols[2].text_input("Search guest name", key="invites_search")
+    filters = {"rsvp": None if rsvp == "All" else rsvp, "survey_done": survey_done, "search": search}
+    render_paged_table(
+        "invites",
+        filters,
+        lambda cursor: fetch_invites_page(supabase, cursor, **filters),
+    )
+
+
+def render_survey_table(supabase):
+    filter_cols = st.columns(3)
+    with filter_cols[0]:
+        passport_confirmed = yes_no_filter("Passport confirmed", "survey_passport")
+    with filter_cols[1]:
+        notify_opt_in = yes_no_filter("Email opt-in", "survey_opt_in")
+    search = filter_cols[2].text_input("Search guest name", key="survey_search")
+    filters = {"passport_confirmed": passport_confirmed, "notify_opt_in": notify_opt_in, "search": search}
+    render_paged_table(
+        "survey",
+        filters,
+        lambda cursor: fetch_survey_page(supabase, cursor, **filters),
+    )
+
+
+def stats_frame(rows, label):
+    return pd.DataFrame(rows, columns=["value", "count"]).rename(columns={"value": label})
+
+
+def bar_chart(rows, field, title):
+    return (
+        alt.Chart(stats_frame(rows, field))
+        .mark_bar()
+        .encode(x=alt.X(f"{field}:N", title=title), y=alt.Y("count:Q", title="Count"))
+    )
+
 
-    invites = invites_res.data or []
-    survey = survey_res.data or []
+def build_admin_charts(stats):
+    return {
+        "rsvp": bar_chart(stats["rsvp_counts"], "rsvp_choice", "RSVP"),
+        "liquor": bar_chart(stats["liquor"], "liquor", "Liquor") if stats["liquor"] else None,
+        "events": bar_chart(stats["events"], "event", "Event") if stats["events"] else None,
+        "arrival": bar_chart(stats["arrival"], "arrival_window", "Arrival window"),
+        "budget": (
+            alt.Chart(stats_frame(stats["budget"], "budget"))
+            .mark_arc()
+            .encode(theta=alt.Theta("count:Q", title="Count"), color=alt.Color("budget:N", title="Budget"))
+        ),
+        "likelihood": (
+            alt.Chart(stats_frame(stats["likelihood"], "likelihood"))
+            .mark_line(point=True)
+            .encode(x=alt.X("likelihood:Q", title="Likelihood"), y=alt.Y("count:Q", title="Count"))
+        ),
+    }
+
+
+@st.cache_resource(show_spinner=False)
+def get_admin_chart_cache():
+    return TTLCache(ADMIN_CHART_CACHE_TTL_SECONDS, ADMIN_CHART_CACHE_MAX_ENTRIES)
+
+
+def cached_for_version(version, key, build):
+    if version is None:
+        return build()
+    cache = get_admin_chart_cache()
+    cached = cache.get((version, key))
+    if cached:
+        return cached
+    value = build()
+    cache.put((version, key), value)
+    return value
+
+
+def load_admin_charts(supabase, counts):
+    def build():
+        stats = counts.get("stats") or load_dashboard_stats(supabase)
+        return {"stats": stats, "charts": build_admin_charts(stats)}
+
+    cached = cached_for_version(counts["version"], "charts", build)
+    return cached["stats"], cached["charts"]
+
+
+def render_choice_lookup(supabase, stats, version=None):
+    labels = {"liquor": "Liquor", "events": "Event"}
+    questions = [question for question in labels if stats[question]]
+    if not questions:
+        return
+    with st.expander("Who picked..."):
+        lookup_cols = st.columns(2)
+        question = lookup_cols[0].selectbox("Question", questions, format_func=labels.get, key="choice_question")
+        choice = lookup_cols[1].selectbox("Choice", [row["value"] for row in stats[question]], key="choice_value")
+        guests = cached_for_version(
+            version,
+            ("choice", question, choice),
+            lambda: {"guests": fetch_choice_guests(supabase, question, choice)},
+        )["guests"]
+        st.write(", ".join(guests) if guests else "Nobody yet.")
+
+
+def render_export_buttons(supabase, name, fetch):
+    def pages():
+        return iter_pages(lambda **kwargs: fetch(supabase, **kwargs))
+
+    export_cols = st.columns(2)
+    export_cols[0].download_button(
+        f"Download {name} CSV",
+        lambda: csv_export(pages()),
+        f"{name}.csv",
+        "text/csv",
+        key=f"{name}_csv",
+    )
+    export_cols[1].download_button(
+        f"Download {name} Parquet",
+        lambda: parquet_export(pages()),
+        f"{name}.parquet",
+        "application/vnd.apache.parquet",
+        key=f"{name}_parquet",
+    )
 
-    invites_df = pd.DataFrame(invites)
-    survey_df = pd.DataFrame(survey)
+
+def render_performance_panel():
+    with st.expander("Performance"):
+        summary = METRICS.summary()
+        if not summary:
+            st.info("No timings recorded yet.")
+            return
+        st.dataframe(pd.DataFrame(summary), hide_index=True, use_container_width=True)
+        st.write("Slowest recent renders")
+        slowest = [
+            {"stage": sample["name"], "ms": sample["ms"], "at": datetime.fromtimestamp(sample["at"]).strftime("%H:%M:%S")}
+            for sample in METRICS.slowest()
+        ]
+        st.dataframe(pd.DataFrame(slowest), hide_index=True, use_container_width=True)
+        if st.button("Reset timings"):
+            METRICS.clear()
+
+
+def admin_dashboard(supabase):
+    st.subheader("Admin Dashboard")
+    sections = SectionTimer("admin")
+    counts = load_invite_stats(supabase)
 
     st.subheader("Quick Stats")
-    total_invites = len(invites_df)
-    total_surveys = len(survey_df)
-    rsvp_yes = int((invites_df.get("rsvp_choice") == "yes").sum()) if not invites_df.empty else 0
-    rsvp_no = int((invites_df.get("rsvp_choice") == "no").sum()) if not invites_df.empty else 0
-    rsvp_pending = max(total_invites - rsvp_yes - rsvp_no, 0)
-    opted_in = int((survey_df.get("notify_opt_in") == True).sum()) if not survey_df.empty else 0
+    total_invites = counts["invites"]
 
     stat_cols = st.columns(4)
     stat_cols[0].metric("Invites", total_invites)
-    stat_cols[1].metric("RSVP Yes", rsvp_yes)
-    stat_cols[2].metric("RSVP No", rsvp_no)
-    stat_cols[3].metric("Surveys", total_surveys)
+    stat_cols[1].metric("RSVP Yes", counts["rsvp_yes"])
+    stat_cols[2].metric("RSVP No", counts["rsvp_no"])
+    stat_cols[3].metric("Surveys", counts["surveys"])
 
     stat_cols = st.columns(3)
-    stat_cols[0].metric("Pending RSVPs", rsvp_pending)
-    stat_cols[1].metric("Email opt-ins", opted_in)
-    if not survey_df.empty and "passport_confirmed" in survey_df.columns:
-        passport_confirmed = int(survey_df["passport_confirmed"].fillna(False).sum())
-        stat_cols[2].metric("Passports confirmed", passport_confirmed)
-    else:
-        stat_cols[2].metric("Passports confirmed", 0)
+    stat_cols[0].metric("Pending RSVPs", counts["rsvp_pending"])
+    stat_cols[1].metric("Email opt-ins", counts["opt_ins"])
+    stat_cols[2].metric("Passports confirmed", counts["passports_confirmed"])
+    if st.button("Rebuild counters"):
+        rebuild_invite_stats(supabase)
+        st.rerun()
+    sections.lap("quick_stats")
+
+    stats, charts = load_admin_charts(supabase, counts)
+    sections.lap("charts")
 
     st.subheader("RSVP Overview")
-    if not invites_df.empty:
-        rsvp_counts = invites_df["rsvp_choice"].fillna("pending").value_counts().reset_index()
-        rsvp_counts.columns = ["rsvp_choice", "count"]
-        rsvp_chart = (
-            alt.Chart(rsvp_counts)
-            .mark_bar()
-            .encode(x=alt.X("rsvp_choice:N", title="RSVP"), y=alt.Y("count:Q", title="Count"))
-        )
-        st.altair_chart(rsvp_chart, use_container_width=True)
-        st.dataframe(invites_df, use_container_width=True)
-        csv_invites = invites_df.to_csv(index=False).encode("utf-8")
-        st.download_button("Download invites CSV", csv_invites, "invites.csv", "text/csv")
+    if total_invites:
+        st.altair_chart(charts["rsvp"], use_container_width=True)
+        render_invites_table(supabase)
+        render_export_buttons(supabase, "invites", fetch_invites_page)
     else:
         st.info("No invites found.")
+    sections.lap("invites")
 
     st.subheader("Survey Responses")
-    if not survey_df.empty:
-        if "passport_confirmed" in survey_df.columns:
-            confirmed = int(survey_df["passport_confirmed"].fillna(False).sum())
-            not_confirmed = int((~survey_df["passport_confirmed"].fillna(False)).sum())
-            st.subheader("Passport Checklist")
-            st.write(f"Confirmed: {confirmed}")
-            st.write(f"Not confirmed: {not_confirmed}")
+    if counts["surveys"]:
+        st.subheader("Passport Checklist")
+        st.write(f"Confirmed: {counts['passports_confirmed']}")
+        st.write(f"Not confirmed: {counts['surveys'] - counts['passports_confirmed']}")
         st.subheader("Survey Charts")
-        if "liquor_preferences" in survey_df.columns:
-            liquor_counts = survey_df["liquor_preferences"].fillna("").str.split(", ").explode()
-            liquor_counts = liquor_counts[liquor_counts != ""].value_counts().reset_index()
-            liquor_counts.columns = ["liquor", "count"]
-            if not liquor_counts.empty:
-                liquor_chart = (
-                    alt.Chart(liquor_counts)
-                    .mark_bar()
-                    .encode(x=alt.X("liquor:N", title="Liquor"), y=alt.Y("count:Q", title="Count"))
-                )
-                st.altair_chart(liquor_chart, use_container_width=True)
-            else:
-                st.info("No liquor preferences yet.")
-        if "event_preferences" in survey_df.columns:
-            event_counts = survey_df["event_preferences"].fillna("").str.split(", ").explode()
-            event_counts = event_counts[event_counts != ""].value_counts().reset_index()
-            event_counts.columns = ["event", "count"]
-            if not event_counts.empty:
-                event_chart = (
-                    alt.Chart(event_counts)
-                    .mark_bar()
-                    .encode(x=alt.X("event:N", title="Event"), y=alt.Y("count:Q", title="Count"))
-                )
-                st.altair_chart(event_chart, use_container_width=True)
-            else:
-                st.info("No event preferences yet.")
-        if "arrival_window" in survey_df.columns:
-            arrival_counts = survey_df["arrival_window"].fillna("Unknown").value_counts().reset_index()
-            arrival_counts.columns = ["arrival_window", "count"]
-            arrival_chart = (
-                alt.Chart(arrival_counts)
-                .mark_bar()
-                .encode(x=alt.X("arrival_window:N", title="Arrival window"), y=alt.Y("count:Q", title="Count"))
-            )
-            st.altair_chart(arrival_chart, use_container_width=True)
-        if "budget_preference" in survey_df.columns:
-            budget_counts = survey_df["budget_preference"].fillna("Unknown").value_counts().reset_index()
-            budget_counts.columns = ["budget", "count"]
-            budget_chart = (
-                alt.Chart(budget_counts)
-                .mark_arc()
-                .encode(theta=alt.Theta("count:Q", title="Count"), color=alt.Color("budget:N", title="Budget"))
-            )
-            st.altair_chart(budget_chart, use_container_width=True)
-        if "attendance_likelihood" in survey_df.columns:
-            likelihood_counts = survey_df["attendance_likelihood"].fillna(0).value_counts().sort_index().reset_index()
-            likelihood_counts.columns = ["likelihood", "count"]
-            likelihood_chart = (
-                alt.Chart(likelihood_counts)
-                .mark_line(point=True)
-                .encode(x=alt.X("likelihood:Q", title="Likelihood"), y=alt.Y("count:Q", title="Count"))
-            )
-            st.altair_chart(likelihood_chart, use_container_width=True)
-        st.dataframe(survey_df, use_container_width=True)
-        csv_survey = survey_df.to_csv(index=False).encode("utf-8")
-        st.download_button("Download survey CSV", csv_survey, "survey.csv", "text/csv")
+        if charts["liquor"] is not None:
+            st.altair_chart(charts["liquor"], use_container_width=True)
+        else:
+            st.info("No liquor preferences yet.")
+        if charts["events"] is not None:
+            st.altair_chart(charts["events"], use_container_width=True)
+        else:
+            st.info("No event preferences yet.")
+        render_choice_lookup(supabase, stats, counts["version"])
+        st.altair_chart(charts["arrival"], use_container_width=True)
+        st.altair_chart(charts["budget"], use_container_width=True)
+        st.altair_chart(charts["likelihood"], use_container_width=True)
+        render_survey_table(supabase)
+        render_export_buttons(supabase, "survey", fetch_survey_page)
     else:
         st.info("No survey responses yet.")
+    sections.lap("survey")
+
+    render_performance_panel()
+    with st.expander("Invite cache"):
+        st.json(
+            {
+                "invites": get_invite_cache().stats(),
+                "misses": get_invite_miss_cache().stats(),
+                "known_tokens": get_known_tokens().stats(),
+                "enter_limiter": get_enter_limiter().stats(),
+            }
+        )
+    with st.expander("Event log writer"):
+        st.json(get_event_log_writer().stats())
+    with st.expander("Email outbox"):
+        st.json(get_outbox_worker().stats())
 
     st.subheader("Notifications")
     reminder_day = date.today() + timedelta(days=1)
@@ -636,11 +1023,14 @@ def admin_dashboard(supabase):
     st.write(f"Events tomorrow: {len(upcoming)}")
     st.write(f"Opted-in emails: {len(recipient_emails)}")
     if st.button("Send 1-day reminders"):
-        if send_event_reminders(recipient_emails, upcoming):
-            st.success("Reminder emails sent.")
+        queued = send_event_reminders(supabase, recipient_emails, upcoming)
+        if queued:
+            st.success(f"Queued {queued} reminder emails.")
     if st.button("Send passport deadline reminder"):
-        if send_passport_deadline_reminder(recipient_emails):
-            st.success("Passport reminder sent.")
+        queued = send_passport_deadline_reminder(supabase, recipient_emails)
+        if queued:
+            st.success(f"Queued {queued} passport reminders.")
+    sections.lap("notifications")
 
 
 def admin_events_manager(supabase):
@@ -655,7 +1045,7 @@ def admin_events_manager(supabase):
         submitted = st.form_submit_button("Add event")
 
     if submitted and title:
-        supabase.table("trip_events").insert(
+        inserted = supabase.table("trip_events").insert(
             {
                 "title": title,
                 "event_date": event_date.isoformat() if event_date else None,
@@ -665,7 +1055,9 @@ def admin_events_manager(supabase):
                 "bring_items": bring_items,
             }
         ).execute()
+        bump_events_version()
         st.success("Event added.")
+        event_key = inserted.data[0].get("id") if inserted.data else f"{title}:{event_date}"
         recipient_emails = get_opted_in_emails(supabase)
         subject = f"New event added: {title}"
         content = (
@@ -675,7 +1067,9 @@ def admin_events_manager(supabase):
             f"{location}\n\n"
             "Check your invite for details."
         )
-        send_bulk_email(recipient_emails, subject, content)
+        queued = send_bulk_email(supabase, recipient_emails, subject, content, f"event-added:{event_key}")
+        if queued:
+            st.info(f"Queued {queued} notification emails.")
 
     events = load_events(supabase)
     if not events:
@@ -731,22 +1125,29 @@ def admin_events_manager(supabase):
                         "updated_at": datetime.utcnow().isoformat(),
                     }
                 ).eq("id", event.get("id")).execute()
+                bump_events_version()
                 st.success("Event updated.")
                 st.rerun()
 
         if st.button("Delete", key=f"delete_{event.get('id')}"):
             supabase.table("trip_events").delete().eq("id", event.get("id")).execute()
+            bump_events_version()
             st.rerun()
     st.markdown("</div>", unsafe_allow_html=True)
 
 
-def main():
+def render_page(render):
     apply_modern_theme()
     st.title(APP_TITLE)
     st.caption("Private invite portal")
 
     supabase = get_supabase_client()
+    start_outbox_worker(supabase)
+    feed_port = st.secrets.get("CALENDAR_FEED_PORT", os.environ.get("CALENDAR_FEED_PORT"))
+    if feed_port:
+        start_calendar_feed_server(int(feed_port))
     if is_admin_request():
+        render["name"] = "admin"
         admin_dashboard(supabase)
         admin_events_manager(supabase)
         return
@@ -755,7 +1156,7 @@ def main():
     if not token:
         st.info("Enter your invite code to continue.")
         input_token = st.text_input("Invite code", help="Codes are 3-32 characters: letters, numbers, dash, underscore.")
-        if st.button("Enter"):
+        if st.button("Enter") and allow_enter_attempt():
             cleaned = normalize_token(input_token)
             if not is_valid_token(cleaned):
                 st.error("That code format looks wrong. Please check your invite code.")
@@ -776,7 +1177,7 @@ def main():
         st.error("Invite code not found. Please enter a valid code.")
         st.info("Enter your invite code to continue.")
         input_token = st.text_input("Invite code", help="Codes are 3-32 characters: letters, numbers, dash, underscore.")
-        if st.button("Enter"):
+        if st.button("Enter") and allow_enter_attempt():
             cleaned = normalize_token(input_token)
             if not is_valid_token(cleaned):
                 st.error("That code format looks wrong. Please check your invite code.")
@@ -789,20 +1190,29 @@ def main():
     rsvp_choice = invite.get("rsvp_choice")
 
     if rsvp_done and rsvp_choice == "no" and not ALLOW_RSVP_REDO:
+        render["name"] = "declined"
         blackout_screen("Thanks for letting us know. We will miss you!")
         return
 
     if rsvp_done and rsvp_choice == "yes":
+        render["name"] = "hub"
         render_full_hub(supabase, invite)
         return
 
     if not invite.get("gate_name_done"):
+        render["name"] = "name_gate"
         render_name_gate(supabase, invite)
         return
 
+    render["name"] = "rsvp_gate"
     render_rsvp_gate(supabase, invite)
 
 
+def main():
+    with timed("render", "landing") as render:
+        render_page(render)
+
+
 def render_name_gate(supabase, invite):
     st.header("Grand Entrance")
     st.write("Welcome. Please confirm your name to open the invite.")
@@ -811,8 +1221,12 @@ def render_name_gate(supabase, invite):
         if not name.strip():
             st.error("Please enter your name.")
             return
-        update_invite(supabase, invite["token"], {"guest_name": name.strip(), "gate_name_done": True})
-        log_event(supabase, invite["token"], "gate_name_done")
+        apply_transition(
+            supabase,
+            invite["token"],
+            {"guest_name": name.strip(), "gate_name_done": True},
+            "gate_name_done",
+        )
         st.rerun()
 
 
@@ -821,40 +1235,14 @@ def render_rsvp_gate(supabase, invite):
     st.write("Trip dates: June 11-17, 2026")
     video_url = invite.get("video_url")
     if video_url:
-        is_image = os.path.splitext(video_url)[1].lower() in {".png", ".jpg", ".jpeg", ".webp", ".gif"}
-        media_label = "Your Photo Message" if is_image else "Your Video Message"
-        st.subheader(media_label)
-        st.markdown("<div class='video-frame'>", unsafe_allow_html=True)
-        if video_url.startswith("http://") or video_url.startswith("https://"):
-            if is_image:
-                st.image(video_url, use_container_width=True)
-            else:
-                st.video(video_url, format="video/mp4", start_time=0)
-        else:
-            local_path = video_url
-            if not os.path.isabs(local_path):
-                if is_image:
-                    gallery_path = os.path.join("assets", "gallery", local_path)
-                    video_path = os.path.join("assets", "videos", local_path)
-                    local_path = gallery_path if os.path.exists(gallery_path) else video_path
-                else:
-                    local_path = os.path.join("assets", "videos", local_path)
-            if os.path.exists(local_path):
-                if is_image:
-                    st.image(local_path, use_container_width=True)
-                else:
-                    st.video(local_path, format="video/mp4", start_time=0)
-            else:
-                st.warning("Media file not found. Check the file path.")
-        st.markdown("</div>", unsafe_allow_html=True)
+        is_image = render_invite_media(video_url)["kind"] == "image"
     else:
         st.info("Video coming soon.")
         return
     if not invite.get("gate_video_done"):
         gate_button_label = "Next" if is_image else "I watched it"
         if st.button(gate_button_label):
-            update_invite(supabase, invite["token"], {"gate_video_done": True})
-            log_event(supabase, invite["token"], "gate_video_done")
+            apply_transition(supabase, invite["token"], {"gate_video_done": True}, "gate_video_done")
             st.rerun()
         st.info("Please confirm you watched the video to continue.")
         return
@@ -866,12 +1254,13 @@ def render_rsvp_gate(supabase, invite):
     if not submitted:
         return
 
-    update_invite(
+    apply_transition(
         supabase,
         invite["token"],
         {"rsvp_done": True, "rsvp_choice": choice},
+        "rsvp_done",
+        choice,
     )
-    log_event(supabase, invite["token"], "rsvp_done", choice)
 
     if choice == "no" and not ALLOW_RSVP_REDO:
         blackout_screen("Thanks for letting us know. We will miss you!")
@@ -880,9 +1269,78 @@ def render_rsvp_gate(supabase, invite):
     st.rerun()
 
 
+def load_more_gallery():
+    st.session_state["gallery_pages"] = st.session_state.get("gallery_pages", 1) + 1
+
+
+@st.fragment
+def render_gallery():
+    gallery = get_gallery_manifest()
+    images = gallery["images"]
+    if not images:
+        st.write("Costa Rica vibes and villa photos coming soon.")
+        return
+    pages = st.session_state.get("gallery_pages", 1)
+    visible = images[: pages * GALLERY_PAGE_SIZE]
+    cols = st.columns(4)
+    for idx, image in enumerate(visible):
+        caption = gallery["entries"][image]["caption"]
+        render_gallery_image(cols[idx % 4], image, "(max-width: 640px) 50vw, 25vw", caption)
+    if len(visible) < len(images):
+        st.caption(f"Showing {len(visible)} of {len(images)} photos.")
+        st.button("Load more photos", key="gallery_load_more", on_click=load_more_gallery)
+
+
+@st.fragment(run_every=AUTO_REFRESH_SECONDS if AUTO_REFRESH_MODE == "fragment" else None)
+def render_itinerary(supabase, guest_name, token):
+    st.markdown("<h2 class='section-title'>Add to Calendar</h2>", unsafe_allow_html=True)
+    st.write(f"{guest_name}, download the calendar invite so you have the dates saved.")
+    events = load_events(supabase)
+    ics, _ = calendar_feed(supabase)
+    st.download_button(
+        "Download calendar invite",
+        data=ics,
+        file_name="costa-rica-trip.ics",
+        mime="text/calendar",
+    )
+    feed_url = calendar_feed_url(token)
+    if feed_url:
+        webcal_url = re.sub(r"^https?://", "webcal://", feed_url)
+        st.markdown(
+            f"Or [subscribe to the trip calendar]({webcal_url}) so new events show up automatically.",
+        )
+
+    if events:
+        st.markdown("<h2 class='section-title'>Itinerary & What to Bring</h2>", unsafe_allow_html=True)
+        st.write(f"{guest_name}, here is the current schedule and what to bring.")
+        st.markdown("<div class='card-grid'>", unsafe_allow_html=True)
+        for event in events:
+            items = parse_items(event.get("bring_items"))
+            date_value = event.get("event_date")
+            if isinstance(date_value, str):
+                date_value = date.fromisoformat(date_value)
+            date_text = date_value.strftime("%B %d") if date_value else ""
+            st.markdown(
+                f"""
+                <div class="card">
+                    <div class="pill">{date_text}</div>
+                    <h3>{event.get('title')}</h3>
+                    <p>{event.get('location') or ''}</p>
+                    <p>{event.get('description') or ''}</p>
+                </div>
+                """,
+                unsafe_allow_html=True,
+            )
+            if items:
+                st.write("Bring:")
+                st.write(", ".join(items))
+        st.markdown("</div>", unsafe_allow_html=True)
+
+
 def render_full_hub(supabase, invite):
+    sections = SectionTimer("hub")
     auto_refresh()
-    gallery_images = get_gallery_images()
+    gallery = get_gallery_manifest()
     guest_name = invite.get("guest_name") or "Friend"
     st.markdown(
         f"""
@@ -909,11 +1367,14 @@ def render_full_hub(supabase, invite):
     )
     st.write("Concierge: Elsa will help arrange activities, dining, and services for the group.")
 
-    map_images = pick_images_by_keyword(gallery_images, "map", limit=2)
+    map_images = pick_images_by_keyword(gallery, "map", limit=2)
     if map_images:
         map_cols = st.columns(len(map_images))
         for idx, image in enumerate(map_images):
-            map_cols[idx].image(image, use_container_width=True, caption=caption_from_filename(image))
+            caption = gallery["entries"][image]["caption"]
+            render_gallery_image(map_cols[idx], image, "(max-width: 640px) 100vw, 50vw", caption)
+
+    sections.lap("place")
 
     st.markdown("**Before you arrive**")
     st.write(
@@ -941,8 +1402,7 @@ def render_full_hub(supabase, invite):
     def save_origin():
         value = st.session_state.get("flight_origin_input", "").strip().upper()
         if value and value != invite.get("flight_origin"):
-            update_invite(supabase, invite["token"], {"flight_origin": value})
-            log_event(supabase, invite["token"], "flight_origin_update", value)
+            apply_transition(supabase, invite["token"], {"flight_origin": value}, "flight_origin_update", value)
 
     origin_input = st.text_input(
         "Origin airport or city",
@@ -952,6 +1412,7 @@ def render_full_hub(supabase, invite):
     )
     origin_value = origin_input.strip() or default_origin
     flights_embed(origin_value)
+    sections.lap("flights")
 
     st.markdown("<h2 class='section-title'>Passport & Timing</h2>", unsafe_allow_html=True)
     if invite.get("needs_passport"):
@@ -971,56 +1432,20 @@ def render_full_hub(supabase, invite):
         upsert_passport_confirmation(supabase, invite["token"], passport_confirmed)
         log_event(supabase, invite["token"], "passport_confirmed_update", str(passport_confirmed))
         st.success("Passport status saved.")
+    sections.lap("passport")
 
     st.markdown("<h2 class='section-title'>Weather</h2>", unsafe_allow_html=True)
     st.write(f"{guest_name}, pack for warm, humid weather with occasional showers.")
     weather_section()
+    sections.lap("weather")
 
-    st.markdown("<h2 class='section-title'>Add to Calendar</h2>", unsafe_allow_html=True)
-    st.write(f"{guest_name}, download the calendar invite so you have the dates saved.")
-    events = load_events(supabase)
-    ics = ics_payload(events)
-    st.download_button(
-        "Download calendar invite",
-        data=ics,
-        file_name="costa-rica-trip.ics",
-        mime="text/calendar",
-    )
-
-    if events:
-        st.markdown("<h2 class='section-title'>Itinerary & What to Bring</h2>", unsafe_allow_html=True)
-        st.write(f"{guest_name}, here is the current schedule and what to bring.")
-        st.markdown("<div class='card-grid'>", unsafe_allow_html=True)
-        for event in events:
-            items = parse_items(event.get("bring_items"))
-            date_value = event.get("event_date")
-            if isinstance(date_value, str):
-                date_value = date.fromisoformat(date_value)
-            date_text = date_value.strftime("%B %d") if date_value else ""
-            st.markdown(
-                f"""
-                <div class="card">
-                    <div class="pill">{date_text}</div>
-                    <h3>{event.get('title')}</h3>
-                    <p>{event.get('location') or ''}</p>
-                    <p>{event.get('description') or ''}</p>
-                </div>
-                """,
-                unsafe_allow_html=True,
-            )
-            if items:
-                st.write("Bring:")
-                st.write(", ".join(items))
-        st.markdown("</div>", unsafe_allow_html=True)
+    render_itinerary(supabase, guest_name, invite["token"])
+    sections.lap("itinerary")
 
     st.markdown("<h2 class='section-title'>Gallery</h2>", unsafe_allow_html=True)
     st.write(f"{guest_name}, a few photos to set the vibe.")
-    if gallery_images:
-        cols = st.columns(4)
-        for idx, image in enumerate(gallery_images):
-            cols[idx % 4].image(image, use_container_width=True, caption=caption_from_filename(image))
-    else:
-        st.write("Costa Rica vibes and villa photos coming soon.")
+    render_gallery()
+    sections.lap("gallery")
 
     if not invite.get("survey_done"):
         st.subheader(f"Quick Survey for {guest_name}")
@@ -1028,37 +1453,14 @@ def render_full_hub(supabase, invite):
         render_survey(supabase, invite)
     else:
         st.success("Survey completed. Thank you!")
+    sections.lap("survey")
 
     video_url = invite.get("video_url")
     if video_url:
-        is_image = os.path.splitext(video_url)[1].lower() in {".png", ".jpg", ".jpeg", ".webp", ".gif"}
-        media_label = "Your Photo Message" if is_image else "Your Video Message"
-        st.subheader(media_label)
-        st.markdown("<div class='video-frame'>", unsafe_allow_html=True)
-        if video_url.startswith("http://") or video_url.startswith("https://"):
-            if is_image:
-                st.image(video_url, use_container_width=True)
-            else:
-                st.video(video_url, format="video/mp4", start_time=0)
-        else:
-            local_path = video_url
-            if not os.path.isabs(local_path):
-                if is_image:
-                    gallery_path = os.path.join("assets", "gallery", local_path)
-                    video_path = os.path.join("assets", "videos", local_path)
-                    local_path = gallery_path if os.path.exists(gallery_path) else video_path
-                else:
-                    local_path = os.path.join("assets", "videos", local_path)
-            if os.path.exists(local_path):
-                if is_image:
-                    st.image(local_path, use_container_width=True)
-                else:
-                    st.video(local_path, format="video/mp4", start_time=0)
-            else:
-                st.warning("Media file not found. Check the file path.")
-        st.markdown("</div>", unsafe_allow_html=True)
+        render_invite_media(video_url)
     else:
         st.info("Video coming soon.")
+    sections.lap("media")
 
 
 def render_survey(supabase, invite):
@@ -1098,9 +1500,12 @@ def render_survey(supabase, invite):
         event_list.append(events_other.strip())
 
     try:
-        supabase.table("survey_responses").insert(
-            {
-                "token": invite["token"],
+        apply_transition(
+            supabase,
+            invite["token"],
+            {"survey_done": True},
+            "survey_done",
+            survey={
                 "liquor_preferences": ", ".join(liquor),
                 "event_preferences": ", ".join(event_list),
                 "arrival_window": arrival,
@@ -1110,10 +1515,8 @@ def render_survey(supabase, invite):
                 "email": email.strip(),
                 "notify_opt_in": notify_opt_in,
                 "notes": notes,
-            }
-        ).execute()
-        update_invite(supabase, invite["token"], {"survey_done": True})
-        log_event(supabase, invite["token"], "survey_done")
+            },
+        )
         st.rerun()
     except Exception:
         st.error("We could not save your survey. Please try again in a moment.")
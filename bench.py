@@ -0,0 +1,193 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+EVENT_SIZES = (10, 100, 1000, 10000)
+SURVEY_SIZES = (1000, 10000, 100000, 1000000)
+QUICK_EVENT_SIZES = (10, 100, 1000)
+QUICK_SURVEY_SIZES = (1000, 10000)
+CITIES = ["Nashville", "nashville tn", "DC", "Houston TX", "Orlando", "Dallas", "Chicago", "", None, "  jfk "]
+BRING_ITEMS = [
+    "Sunscreen, Water, Hat",
+    "Swimsuit\nTowel, Sandals",
+    "Passport, Cash, Phone charger, Snacks, Bug spray",
+    "",
+]
+REGRESSION_RATIO = 1.25
+
+
+def load_app():
+    sys.path.insert(0, BENCH_DIR)
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    import app
+
+    return app
+
+
+def make_events(count, seed=7):
+    rng = random.Random(seed)
+    first_day = date(2026, 6, 11)
+    return [
+        {
+            "id": str(idx),
+            "title": f"Event {idx}",
+            "event_date": (first_day + timedelta(days=idx % 7)).isoformat(),
+            "event_time": f"{8 + idx % 14:02d}:{rng.choice(['00', '15', '30', '45'])}:00",
+            "location": rng.choice(["Beach Club", "Casa Hamacas", "Tamarindo", ""]),
+            "description": "Planned activity, bring friends\nMeet at the villa",
+            "bring_items": rng.choice(BRING_ITEMS),
+        }
+        for idx in range(count)
+    ]
+
+
+def make_surveys(count, seed=7):
+    from loadtest import survey_row
+
+    rng = random.Random(seed)
+    return [survey_row(rng, f"guest{idx % 500:06d}", "2026-01-01T00:00:00") for idx in range(count)]
+
+
+def make_invites(count, seed=7):
+    rng = random.Random(seed)
+    return [{"rsvp_choice": rng.choice(["yes", "yes", "no", None])} for _ in range(count)]
+
+
+def measure(func, repeat, number):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    gc.collect()
+    tracemalloc.start()
+    func()
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained_blocks = sum(stat.count for stat in snapshot.statistics("filename"))
+    return {
+        "min_ms": min(timings) * 1000,
+        "median_ms": statistics.median(timings) * 1000,
+        "repeat": repeat,
+        "number": number,
+        "peak_kb": peak / 1024,
+        "retained_kb": current / 1024,
+        "retained_blocks": retained_blocks,
+    }
+
+
+def build_cases(app, event_sizes, survey_sizes):
+    from admin_stats import aggregate_stats
+
+    def event_cases(size):
+        events = make_events(size)
+        return {
+            f"ics_payload[{size}]": lambda: app.ics_payload(events),
+            f"format_event_line[{size}]": lambda: [app.format_event_line(event) for event in events],
+            f"parse_items[{size}]": lambda: [app.parse_items(event["bring_items"]) for event in events],
+        }
+
+    def survey_cases(size):
+        surveys = make_surveys(size)
+        invites = make_invites(max(size // 4, 1))
+        return {f"aggregate_stats[{size}]": lambda: aggregate_stats(invites, surveys)}
+
+    groups = [
+        ([f"ics_payload[{size}]", f"format_event_line[{size}]", f"parse_items[{size}]"], lambda size=size: event_cases(size))
+        for size in event_sizes
+    ]
+    groups.append((["flights_link[1000]"], lambda: {"flights_link[1000]": lambda: [app.flights_link(city) for city in CITIES * 100]}))
+    groups.extend(([f"aggregate_stats[{size}]"], lambda size=size: survey_cases(size)) for size in survey_sizes)
+    return groups
+
+
+def pick_repeat(func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    if elapsed > 1.0:
+        return 3, 1
+    if elapsed > 0.05:
+        return 5, 1
+    return 7, max(1, int(0.05 / max(elapsed, 1e-6)))
+
+
+def run_benchmarks(args):
+    app = load_app()
+    event_sizes = QUICK_EVENT_SIZES if args.quick else EVENT_SIZES
+    survey_sizes = QUICK_SURVEY_SIZES if args.quick else SURVEY_SIZES
+    results = {}
+    for names, setup in build_cases(app, event_sizes, survey_sizes):
+        names = [name for name in names if not args.filter or args.filter in name]
+        if not names:
+            continue
+        cases = setup()
+        for name in names:
+            repeat, number = pick_repeat(cases[name])
+            results[name] = measure(cases[name], repeat, number)
+            print(f"{name:32} {results[name]['median_ms']:12.3f} ms  peak {results[name]['peak_kb']:10.1f} KiB", file=sys.stderr)
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(report, baseline, ratio=REGRESSION_RATIO):
+    rows = []
+    for name, result in report["results"].items():
+        base = baseline["results"].get(name)
+        if not base:
+            continue
+        change = result["min_ms"] / base["min_ms"] if base["min_ms"] else None
+        rows.append(
+            {
+                "case": name,
+                "baseline_ms": base["min_ms"],
+                "min_ms": result["min_ms"],
+                "ratio": change,
+                "regressed": change is not None and change > ratio,
+            }
+        )
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks for pure helpers and admin aggregation.")
+    parser.add_argument("--quick", action="store_true", help="skip the 10k-event and 100k+ survey cases")
+    parser.add_argument("--filter", help="only run cases whose name contains this text")
+    parser.add_argument("--save", help="write the results as a baseline JSON file")
+    parser.add_argument("--compare", help="compare against a baseline JSON file; exit 1 on regressions")
+    parser.add_argument("--ratio", type=float, default=REGRESSION_RATIO, help="slowdown of the best run that counts as a regression")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = run_benchmarks(args)
+    if args.save:
+        with open(args.save, "w") as handle:
+            json.dump(report, handle, indent=2)
+            handle.write("\n")
+    if args.compare:
+        with open(args.compare) as handle:
+            rows = compare(report, json.load(handle), args.ratio)
+        print(json.dumps(rows, indent=2))
+        sys.exit(1 if any(row["regressed"] for row in rows) else 0)
+    if not args.save:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    def __init__(self, ttl_seconds, max_entries):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return dict(value)
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, dict(value))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def update(self, key, changes):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            merged = dict(entry[1])
+            merged.update(changes)
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, merged)
+            self.entries.move_to_end(key)
+
+    def evict(self, key):
+        with self.lock:
+            if self.entries.pop(key, None) is not None:
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.evictions += len(self.entries)
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class VersionedCache:
+    def __init__(self, max_age_seconds):
+        self.max_age_seconds = max_age_seconds
+        self.lock = threading.Lock()
+        self.version = 0
+        self.loaded_version = -1
+        self.loaded_at = 0.0
+        self.value = None
+
+    def bump(self):
+        with self.lock:
+            self.version += 1
+            return self.version
+
+    def get(self, loader):
+        with self.lock:
+            version = self.version
+            fresh = time.monotonic() - self.loaded_at < self.max_age_seconds
+            if self.loaded_version == version and fresh:
+                return version, self.value
+        value = loader()
+        with self.lock:
+            if self.version == version:
+                if self.loaded_version == version and value != self.value:
+                    self.version += 1
+                    version = self.version
+                self.value = value
+                self.loaded_version = version
+                self.loaded_at = time.monotonic()
+        return version, value
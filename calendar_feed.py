@@ -0,0 +1,136 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+FEED_PATH = re.compile(r"^/calendar/([A-Za-z0-9_-]{3,32})\.ics$")
+ATTENDANCE_PATH = "/attendance.json"
+FEED_CACHE_CONTROL = "private, max-age=300"
+FEED_CHUNK_SIZE = 64 * 1024
+
+
+class FeedCache:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.builds = 0
+
+    def get(self, key, build):
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached:
+                self.entries.move_to_end(key)
+                return cached
+        body = "".join(build()).encode("utf-8")
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        with self.lock:
+            self.entries[key] = (body, etag)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.builds += 1
+        return body, etag
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def make_feed_handler(loader, attendance_loader=None):
+    class CalendarFeedHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def resolve(self):
+            url = urlparse(self.path)
+            match = FEED_PATH.match(url.path)
+            if not match:
+                return None
+            params = parse_qs(url.query)
+            upcoming = params.get("upcoming", ["0"])[0] in {"1", "true", "yes"}
+            return loader(match.group(1), upcoming)
+
+        def respond_attendance(self, include_body):
+            try:
+                body = attendance_loader(parse_qs(urlparse(self.path).query))
+            except Exception:
+                self.send_error(503, "Attendance temporarily unavailable")
+                return
+            if body is None:
+                self.send_error(404, "Not found")
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.end_headers()
+            if include_body:
+                self.wfile.write(body)
+
+        def respond(self, include_body):
+            if attendance_loader and urlparse(self.path).path == ATTENDANCE_PATH:
+                self.respond_attendance(include_body)
+                return
+            try:
+                result = self.resolve()
+            except Exception:
+                self.send_error(503, "Calendar temporarily unavailable")
+                return
+            if result is None:
+                self.send_error(404, "Calendar not found")
+                return
+            body, etag = result
+            if etag_matches(self.headers.get("If-None-Match"), etag):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", FEED_CACHE_CONTROL)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/calendar; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", FEED_CACHE_CONTROL)
+            self.end_headers()
+            if include_body:
+                view = memoryview(body)
+                for start in range(0, len(body), FEED_CHUNK_SIZE):
+                    self.wfile.write(view[start:start + FEED_CHUNK_SIZE])
+
+        def do_GET(self):
+            self.respond(True)
+
+        def do_HEAD(self):
+            self.respond(False)
+
+    return CalendarFeedHandler
+
+
+class CalendarFeedServer:
+    def __init__(self, port, loader, host="0.0.0.0", attendance_loader=None):
+        self.httpd = ThreadingHTTPServer((host, port), make_feed_handler(loader, attendance_loader))
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="calendar-feed", daemon=True)
+        self.thread.start()
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
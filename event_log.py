@@ -0,0 +1,91 @@
+import atexit
+import queue
+import threading
+import time
+
+
+class EventLogWriter:
+    def __init__(self, table, batch_size=50, flush_seconds=2.0, max_pending=5000):
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.client = None
+        self.written = 0
+        self.dropped = 0
+        self.failed_batches = 0
+        self.thread = threading.Thread(target=self.run, name="event-log-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def submit(self, client, row):
+        self.client = client
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+
+    def run(self):
+        while not self.stop_event.is_set():
+            batch = self.collect(self.flush_seconds)
+            if batch:
+                self.write(batch)
+
+    def collect(self, timeout):
+        batch = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def write(self, batch):
+        with self.write_lock:
+            try:
+                self.client.table(self.table).insert(batch).execute()
+            except Exception:
+                with self.lock:
+                    self.failed_batches += 1
+                    self.dropped += len(batch)
+                return
+            with self.lock:
+                self.written += len(batch)
+
+    def flush(self):
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self.write(batch)
+
+    def close(self):
+        self.stop_event.set()
+        self.thread.join(timeout=self.flush_seconds + 5)
+        if self.client is not None:
+            self.flush()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "pending": self.queue.qsize(),
+                "max_pending": self.queue.maxsize,
+                "batch_size": self.batch_size,
+                "flush_seconds": self.flush_seconds,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed_batches": self.failed_batches,
+            }
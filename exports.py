@@ -0,0 +1,71 @@
+import csv
+import io
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+EXPORT_PAGE_SIZE = 500
+EXPORT_COLUMN_TYPES = {
+    "needs_passport": pa.bool_(),
+    "gate_name_done": pa.bool_(),
+    "gate_video_done": pa.bool_(),
+    "rsvp_done": pa.bool_(),
+    "survey_done": pa.bool_(),
+    "notify_opt_in": pa.bool_(),
+    "passport_confirmed": pa.bool_(),
+    "attendance_likelihood": pa.int64(),
+}
+
+
+def iter_pages(fetch, page_size=EXPORT_PAGE_SIZE):
+    cursor = None
+    while True:
+        rows, cursor = fetch(cursor=cursor, page_size=page_size)
+        if rows:
+            yield rows
+        if not cursor:
+            return
+
+
+def csv_export(pages):
+    out = io.BytesIO()
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    writer = None
+    for rows in pages:
+        if writer is None:
+            writer = csv.DictWriter(text, fieldnames=list(rows[0]), extrasaction="ignore")
+            writer.writeheader()
+        writer.writerows(rows)
+    text.flush()
+    text.detach()
+    return out.getvalue()
+
+
+def export_schema(columns):
+    return pa.schema([pa.field(name, EXPORT_COLUMN_TYPES.get(name, pa.string())) for name in columns])
+
+
+def page_table(rows, schema):
+    table = pa.Table.from_pylist(rows)
+    arrays = []
+    for field in schema:
+        if field.name in table.column_names:
+            arrays.append(table.column(field.name).cast(field.type))
+        else:
+            arrays.append(pa.nulls(len(rows), field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def parquet_export(pages):
+    out = io.BytesIO()
+    writer = None
+    for rows in pages:
+        if writer is None:
+            schema = export_schema(list(rows[0]))
+            writer = pq.ParquetWriter(out, schema, compression="zstd")
+        writer.write_table(page_table(rows, schema))
+    if writer is None:
+        pq.write_table(export_schema(list(EXPORT_COLUMN_TYPES)).empty_table(), out, compression="zstd")
+    else:
+        writer.close()
+    return out.getvalue()
@@ -0,0 +1,224 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from html import escape
+from PIL import Image, ImageOps
+
+
+DERIVATIVE_DIR = "static/gallery"
+DERIVATIVE_URL = "app/static/gallery"
+DERIVATIVE_WIDTHS = (320, 640, 1280)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+DERIVATIVE_WORKERS = 2
+DERIVATIVE_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 6}),
+    "jpg": ("JPEG", {"quality": 82, "progressive": True, "optimize": True}),
+}
+
+_hash_cache = {}
+_derivative_cache = {}
+_pending = {}
+_failed = set()
+_manifest = {"key": None, "value": None}
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=DERIVATIVE_WORKERS, thread_name_prefix="gallery-derivatives")
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+def content_hash(path):
+    signature = file_signature(path)
+    with _lock:
+        cached = _hash_cache.get(signature)
+    if cached:
+        return cached
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(block)
+    value = digest.hexdigest()[:20]
+    with _lock:
+        _hash_cache[signature] = value
+    return value
+
+
+def temp_name(target):
+    return f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def write_derivative(image, target, width, fmt):
+    resized = image.copy()
+    resized.thumbnail((width, width * 4), Image.LANCZOS)
+    pil_format, options = DERIVATIVE_FORMATS[fmt]
+    temp_path = temp_name(target)
+    resized.save(temp_path, pil_format, **options)
+    os.replace(temp_path, target)
+
+
+def build_derivatives(path, widths=DERIVATIVE_WIDTHS):
+    signature = file_signature(path)
+    with _lock:
+        cached = _derivative_cache.get(signature)
+    if cached:
+        return cached
+    key = content_hash(path)
+    os.makedirs(DERIVATIVE_DIR, exist_ok=True)
+    ext = os.path.splitext(path)[1].lower()
+    original_name = f"{key}-full{ext}"
+    original_target = os.path.join(DERIVATIVE_DIR, original_name)
+    if not os.path.exists(original_target):
+        temp_path = temp_name(original_target)
+        shutil.copyfile(path, temp_path)
+        os.replace(temp_path, original_target)
+    image = None
+    result = {"hash": key, "original": original_name, "webp": {}, "jpg": {}}
+    for width in widths:
+        for fmt in DERIVATIVE_FORMATS:
+            name = f"{key}-{width}.{fmt}"
+            target = os.path.join(DERIVATIVE_DIR, name)
+            if not os.path.exists(target):
+                if image is None:
+                    image = ImageOps.exif_transpose(Image.open(path)).convert("RGB")
+                write_derivative(image, target, width, fmt)
+            result[fmt][width] = name
+    with _lock:
+        _derivative_cache[signature] = result
+    return result
+
+
+def finish_derivatives(signature, future):
+    with _lock:
+        _pending.pop(signature, None)
+        if future.exception() is not None:
+            _failed.add(signature)
+
+
+def schedule_derivatives(path):
+    signature = file_signature(path)
+    with _lock:
+        cached = _derivative_cache.get(signature)
+        if cached or signature in _pending or signature in _failed:
+            return cached
+        future = _executor.submit(build_derivatives, path)
+        _pending[signature] = future
+    future.add_done_callback(partial(finish_derivatives, signature))
+    return None
+
+
+def warm_derivatives(paths):
+    for path in paths:
+        try:
+            schedule_derivatives(path)
+        except OSError:
+            pass
+
+
+def srcset(names):
+    return ", ".join(f"{DERIVATIVE_URL}/{name} {width}w" for width, name in sorted(names.items()))
+
+
+def picture_html(derivatives, caption, sizes="(max-width: 640px) 50vw, 25vw"):
+    smallest = min(derivatives["jpg"])
+    alt = escape(caption or "")
+    return (
+        f"<figure style='margin:0 0 12px 0'>"
+        f"<a href='{DERIVATIVE_URL}/{derivatives['original']}' target='_blank'>"
+        f"<picture>"
+        f"<source type='image/webp' srcset='{srcset(derivatives['webp'])}' sizes='{sizes}'>"
+        f"<img src='{DERIVATIVE_URL}/{derivatives['jpg'][smallest]}' srcset='{srcset(derivatives['jpg'])}' "
+        f"sizes='{sizes}' alt='{alt}' loading='lazy' decoding='async' style='width:100%;height:auto'>"
+        f"</picture></a>"
+        f"<figcaption style='font-size:13px;color:#4b5563;text-align:center'>{alt}</figcaption>"
+        f"</figure>"
+    )
+
+
+def caption_from_filename(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return name.replace("_", " ").replace("-", " ").title()
+
+
+def tags_from_filename(path):
+    name = os.path.splitext(os.path.basename(path))[0].lower()
+    return sorted(set(re.findall(r"[a-z]+", name)))
+
+
+def local_entry(path):
+    stat = os.stat(path)
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+    except OSError:
+        width, height = None, None
+    return {
+        "path": path,
+        "hash": content_hash(path),
+        "width": width,
+        "height": height,
+        "bytes": stat.st_size,
+        "caption": caption_from_filename(path),
+        "tags": tags_from_filename(path),
+        "remote": False,
+    }
+
+
+def remote_entry(url):
+    return {
+        "path": url,
+        "hash": None,
+        "width": None,
+        "height": None,
+        "bytes": None,
+        "caption": caption_from_filename(url),
+        "tags": tags_from_filename(url),
+        "remote": True,
+    }
+
+
+def scan_gallery(directory, urls):
+    entries = []
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                entries.append(local_entry(os.path.join(directory, name)))
+    entries.extend(remote_entry(url) for url in urls)
+    by_tag = {}
+    for entry in entries:
+        for tag in entry["tags"]:
+            by_tag.setdefault(tag, []).append(entry["path"])
+    return {
+        "images": [entry["path"] for entry in entries],
+        "entries": {entry["path"]: entry for entry in entries},
+        "by_tag": by_tag,
+    }
+
+
+def load_manifest(directory, urls):
+    mtime = os.stat(directory).st_mtime_ns if os.path.isdir(directory) else None
+    key = (directory, mtime, tuple(urls))
+    with _lock:
+        if _manifest["key"] == key:
+            return _manifest["value"]
+    value = scan_gallery(directory, urls)
+    with _lock:
+        _manifest["key"] = key
+        _manifest["value"] = value
+    warm_derivatives(entry["path"] for entry in value["entries"].values() if not entry["remote"])
+    return value
+
+
+if __name__ == "__main__":
+    import sys
+
+    source_dir = sys.argv[1] if len(sys.argv) > 1 else "assets/gallery"
+    for name in sorted(os.listdir(source_dir)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            built = build_derivatives(os.path.join(source_dir, name))
+            print(f"{name} -> {built['hash']}")
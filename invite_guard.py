@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+TOKEN_PAGE_SIZE = 1000
+
+
+def fetch_invite_tokens(supabase, page_size=TOKEN_PAGE_SIZE):
+    tokens = set()
+    last = None
+    while True:
+        query = supabase.table("invites").select("token").order("token").limit(page_size)
+        if last is not None:
+            query = query.gt("token", last)
+        rows = query.execute().data or []
+        tokens.update(row["token"] for row in rows)
+        if len(rows) < page_size:
+            return tokens
+        last = rows[-1]["token"]
+
+
+class KnownTokens:
+    def __init__(self, refresh_seconds, recheck_seconds):
+        self.refresh_seconds = refresh_seconds
+        self.recheck_seconds = recheck_seconds
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.tokens = None
+        self.added = None
+        self.loaded_at = 0.0
+        self.refreshes = 0
+        self.rejected = 0
+        self.failures = 0
+
+    def refresh(self, supabase):
+        if not self.refresh_lock.acquire(blocking=False):
+            return
+        try:
+            with self.lock:
+                self.added = set()
+            try:
+                tokens = fetch_invite_tokens(supabase)
+            except Exception:
+                with self.lock:
+                    self.added = None
+                    self.failures += 1
+                return
+            with self.lock:
+                self.tokens = tokens | self.added
+                self.added = None
+                self.loaded_at = time.monotonic()
+                self.refreshes += 1
+        finally:
+            self.refresh_lock.release()
+
+    def refresh_in_background(self, supabase):
+        if self.refresh_lock.locked():
+            return
+        threading.Thread(target=self.refresh, args=(supabase,), name="invite-token-refresh", daemon=True).start()
+
+    def add(self, token):
+        with self.lock:
+            if self.tokens is not None:
+                self.tokens.add(token)
+            if self.added is not None:
+                self.added.add(token)
+
+    def check(self, supabase, token):
+        with self.lock:
+            age = time.monotonic() - self.loaded_at
+            loaded = self.tokens is not None
+            known = loaded and token in self.tokens
+        if not loaded or age > self.refresh_seconds:
+            self.refresh_in_background(supabase)
+        if not loaded:
+            return None
+        if known:
+            return True
+        if age > self.recheck_seconds:
+            self.refresh_in_background(supabase)
+            return None
+        with self.lock:
+            self.rejected += 1
+        return False
+
+    def stats(self):
+        with self.lock:
+            return {
+                "tokens": len(self.tokens) if self.tokens is not None else None,
+                "age_seconds": round(time.monotonic() - self.loaded_at, 1) if self.tokens is not None else None,
+                "refreshes": self.refreshes,
+                "rejected": self.rejected,
+                "failures": self.failures,
+            }
+
+
+class AttemptLimiter:
+    def __init__(self, max_attempts, window_seconds, max_clients=10000):
+        self.max_attempts = max_attempts
+        self.window_seconds = window_seconds
+        self.max_clients = max_clients
+        self.lock = threading.Lock()
+        self.attempts = OrderedDict()
+        self.blocked = 0
+
+    def allow(self, key):
+        now = time.monotonic()
+        with self.lock:
+            recent = self.attempts.get(key)
+            if recent is None:
+                recent = deque()
+                self.attempts[key] = recent
+            self.attempts.move_to_end(key)
+            while recent and now - recent[0] > self.window_seconds:
+                recent.popleft()
+            while len(self.attempts) > self.max_clients:
+                self.attempts.popitem(last=False)
+            if len(recent) >= self.max_attempts:
+                self.blocked += 1
+                return False
+            recent.append(now)
+            return True
+
+    def stats(self):
+        with self.lock:
+            return {
+                "clients": len(self.attempts),
+                "max_attempts": self.max_attempts,
+                "window_seconds": self.window_seconds,
+                "blocked": self.blocked,
+            }
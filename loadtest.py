@@ -0,0 +1,630 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import re
+import resource
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+import urllib.request
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from urllib.parse import urlencode
+from metrics import percentile
+
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(APP_DIR, "app.py")
+STAGES = ("name_gate", "rsvp_gate", "hub", "admin")
+SCHEMA_TABLES = (
+    "invites",
+    "survey_responses",
+    "invite_events",
+    "trip_events",
+    "email_outbox",
+    "invite_stats",
+    "survey_choices",
+)
+CHOICE_QUESTIONS = {"liquor": "liquor_preferences", "events": "event_preferences"}
+STATS_COLUMNS = {
+    "invites": {"rsvp_choice", "guest_name"},
+    "survey_responses": {
+        "token",
+        "liquor_preferences",
+        "event_preferences",
+        "arrival_window",
+        "budget_preference",
+        "attendance_likelihood",
+        "notify_opt_in",
+        "passport_confirmed",
+    },
+}
+ADMIN_TOKEN = "loadtest-admin"
+SERVER_START_SECONDS = 60
+OUTBOX_STALE_SECONDS = 600
+LIQUOR_CHOICES = ["Rum", "Tequila", "Vodka", "Whiskey", "Gin", "Wine", "Beer", "No alcohol"]
+EVENT_CHOICES = ["Beach day", "Zip lining", "Catamaran", "Volcano hike", "Spa", "Night out"]
+ARRIVAL_WINDOWS = ["June 10", "June 11", "June 12", "Later"]
+BUDGETS = ["$", "$$", "$$$"]
+EMBED = re.compile(r"(\w+)(!inner)?\(([^)]*)\)")
+CURSOR = re.compile(r'created_at\.lt\."([^"]*)",and\(created_at\.eq\."[^"]*",(\w+)\.lt\."([^"]*)"\)')
+
+
+class MissingRelation(Exception):
+    code = "PGRST205"
+
+
+class MissingFunction(Exception):
+    code = "PGRST202"
+
+
+class MemoryResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class MemoryQuery:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+        self.op = "select"
+        self.columns = "*"
+        self.filters = []
+        self.orders = []
+        self.row_limit = None
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+
+    def select(self, columns="*", **kwargs):
+        self.columns = columns
+        return self
+
+    def where(self, column, test):
+        if "." in column:
+            embed, field = column.split(".", 1)
+            self.filters.append(lambda row: test((row.get(embed) or {}).get(field)))
+        else:
+            self.filters.append(lambda row: test(row.get(column)))
+        return self
+
+    def eq(self, column, value):
+        return self.where(column, lambda current: current == value)
+
+    def in_(self, column, values):
+        return self.where(column, lambda current: current in values)
+
+    def gt(self, column, value):
+        return self.where(column, lambda current: current is not None and str(current) > str(value))
+
+    def lte(self, column, value):
+        return self.where(column, lambda current: current is not None and str(current) <= str(value))
+
+    def ilike(self, column, pattern):
+        needle = pattern.strip("%").lower()
+        return self.where(column, lambda current: needle in (current or "").lower())
+
+    def is_(self, column, value):
+        return self.where(column, lambda current: current is None)
+
+    def or_(self, expression):
+        match = CURSOR.match(expression)
+        if not match:
+            raise ValueError(f"Unsupported filter: {expression}")
+        created_at, key, key_value = match.groups()
+        self.filters.append(
+            lambda row: str(row.get("created_at")) < created_at
+            or (str(row.get("created_at")) == created_at and str(row.get(key)) < key_value)
+        )
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def insert(self, payload):
+        self.op = "insert"
+        self.payload = payload
+        return self
+
+    def upsert(self, payload, on_conflict=None, ignore_duplicates=False, **kwargs):
+        self.op = "upsert"
+        self.payload = payload
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, payload):
+        self.op = "update"
+        self.payload = payload
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def embed(self, row):
+        row = dict(row)
+        for name, _, _ in EMBED.findall(self.columns):
+            parent = self.db.index.get(name, {}).get(row.get("token"))
+            row[name] = dict(parent) if parent else None
+        return row
+
+    def write(self, rows):
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        now = datetime.utcnow().isoformat()
+        written = []
+        for item in payload:
+            if self.on_conflict:
+                existing = next((row for row in rows if row.get(self.on_conflict) == item.get(self.on_conflict)), None)
+                if existing is not None:
+                    if not self.ignore_duplicates:
+                        existing.update(item)
+                        written.append(existing)
+                    continue
+            row = {"id": str(uuid.uuid4()), "created_at": now, **item}
+            rows.append(row)
+            if self.name == "invites":
+                self.db.index["invites"][row["token"]] = row
+            written.append(row)
+        return written
+
+    def execute(self):
+        self.db.record(self.name, self.op)
+        with self.db.lock:
+            return MemoryResponse(self.run())
+
+    def run(self):
+        rows = self.db.rows(self.name)
+        if self.op in {"insert", "upsert"}:
+            written = self.write(rows)
+            self.db.changed(self.name, written)
+            return [dict(row) for row in written]
+        embedded = EMBED.search(self.columns) is not None
+        candidates = [self.embed(row) for row in rows] if embedded else rows
+        matched = [row for row in candidates if all(test(row) for test in self.filters)]
+        inner = [name for name, required, _ in EMBED.findall(self.columns) if required]
+        if inner:
+            matched = [row for row in matched if all(row.get(name) for name in inner)]
+        if self.op == "update":
+            keys = {row["id"] for row in matched}
+            updated = [row for row in rows if row["id"] in keys]
+            columns = {key for key, value in self.payload.items() for row in updated if row.get(key) != value}
+            for row in updated:
+                row.update(self.payload)
+            self.db.changed(self.name, updated, columns)
+            return [dict(row) for row in updated]
+        if self.op == "delete":
+            keys = {row["id"] for row in matched}
+            self.db.tables[self.name] = [row for row in rows if row["id"] not in keys]
+            self.db.changed(self.name, matched, removed=True)
+            return [dict(row) for row in matched]
+        for column, desc in reversed(self.orders):
+            matched = sorted(matched, key=lambda row: (row.get(column) is None, str(row.get(column))), reverse=desc)
+        if self.row_limit is not None:
+            matched = matched[:self.row_limit]
+        return [dict(row) for row in matched]
+
+
+class MemoryRpc:
+    def __init__(self, db, name, params):
+        self.db = db
+        self.name = name
+        self.params = params or {}
+
+    def execute(self):
+        self.db.record("rpc", self.name)
+        handler = self.db.rpcs.get(self.name)
+        if handler is None:
+            raise MissingFunction(self.name)
+        with self.db.lock:
+            return MemoryResponse(handler(self.params))
+
+
+class MemorySupabase:
+    def __init__(self, tables, latency_seconds=0.0):
+        self.tables = tables
+        self.index = {"invites": {row["token"]: row for row in tables["invites"]}}
+        self.views = {"notification_recipients": self.notification_recipients}
+        self.rpcs = {
+            "admin_dashboard_stats": self.admin_dashboard_stats,
+            "apply_invite_transition": self.apply_invite_transition,
+            "claim_email_outbox": self.claim_email_outbox,
+            "rebuild_invite_stats": self.rebuild_invite_stats,
+        }
+        self.latency_seconds = latency_seconds
+        self.lock = threading.RLock()
+        self.calls = 0
+        self.by_operation = {}
+        self.by_session = {}
+        self.sync_choices(tables["survey_responses"])
+        self.rebuild_invite_stats()
+
+    def record(self, name, op):
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx(suppress_warning=True)
+        session = ctx.session_id if ctx else "background"
+        with self.lock:
+            self.calls += 1
+            key = f"{name}.{op}"
+            self.by_operation[key] = self.by_operation.get(key, 0) + 1
+            self.by_session[session] = self.by_session.get(session, 0) + 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+    def table(self, name):
+        return MemoryQuery(self, name)
+
+    def rpc(self, name, params=None):
+        return MemoryRpc(self, name, params)
+
+    def rows(self, name):
+        if name in self.views:
+            return self.views[name]()
+        if name not in self.tables:
+            raise MissingRelation(name)
+        return self.tables[name]
+
+    def changed(self, name, rows, columns=None, removed=False):
+        tracked = STATS_COLUMNS.get(name)
+        if not tracked or (columns is not None and not tracked & columns):
+            return
+        if name == "survey_responses":
+            self.sync_choices(rows, removed=removed)
+        self.rebuild_invite_stats()
+
+    def sync_choices(self, surveys, removed=False):
+        ids = {row["id"] for row in surveys}
+        choices = [row for row in self.tables["survey_choices"] if row["survey_id"] not in ids]
+        if not removed:
+            for row in surveys:
+                for question, column in CHOICE_QUESTIONS.items():
+                    for choice in dict.fromkeys(item for item in (row.get(column) or "").split(", ") if item):
+                        choices.append({"survey_id": row["id"], "token": row.get("token"), "question": question, "choice": choice})
+        self.tables["survey_choices"] = choices
+
+    def notification_recipients(self):
+        latest = {}
+        for row in sorted(self.tables["survey_responses"], key=lambda row: str(row.get("created_at"))):
+            if (row.get("email") or "").strip():
+                latest[row.get("token")] = row
+        emails = {row["email"].strip().lower() for row in latest.values() if row.get("notify_opt_in")}
+        return [{"email": email} for email in sorted(emails)]
+
+    def admin_dashboard_stats(self, params=None):
+        from admin_stats import aggregate_stats
+
+        return aggregate_stats(self.tables["invites"], self.tables["survey_responses"])
+
+    def rebuild_invite_stats(self, params=None):
+        invites = self.tables["invites"]
+        surveys = self.tables["survey_responses"]
+        current = self.tables["invite_stats"][0] if self.tables["invite_stats"] else {"version": -1}
+        row = {
+            "id": 1,
+            "invites": len(invites),
+            "rsvp_yes": sum(row.get("rsvp_choice") == "yes" for row in invites),
+            "rsvp_no": sum(row.get("rsvp_choice") == "no" for row in invites),
+            "surveys": len(surveys),
+            "opt_ins": sum(row.get("notify_opt_in") is True for row in surveys),
+            "passports_confirmed": sum(bool(row.get("passport_confirmed")) for row in surveys),
+            "version": current["version"] + 1,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self.tables["invite_stats"] = [row]
+        return dict(row)
+
+    def apply_invite_transition(self, params):
+        token = params.get("p_token")
+        if params.get("p_survey") is not None:
+            self.table("survey_responses").insert({"token": token, **params["p_survey"]}).run()
+        changes = {**(params.get("p_changes") or {}), "updated_at": datetime.now(timezone.utc).isoformat()}
+        rows = self.table("invites").update(changes).eq("token", token).run()
+        if params.get("p_event_type"):
+            self.table("invite_events").insert(
+                {"token": token, "event_type": params["p_event_type"], "detail": params.get("p_detail") or ""}
+            ).run()
+        return rows[0] if rows else None
+
+    def claim_email_outbox(self, params):
+        now = datetime.now(timezone.utc)
+        stale = (now - timedelta(seconds=OUTBOX_STALE_SECONDS)).isoformat()
+        rows = [
+            row
+            for row in sorted(self.tables["email_outbox"], key=lambda row: str(row.get("created_at")))
+            if (row.get("status", "pending") == "pending" and str(row.get("available_at") or "") <= now.isoformat())
+            or (row.get("status") == "sending" and str(row.get("claimed_at")) < stale)
+        ][:params.get("p_limit", 200)]
+        for row in rows:
+            row.update({"status": "sending", "attempts": (row.get("attempts") or 0) + 1, "claimed_at": now.isoformat()})
+        return [dict(row) for row in rows]
+
+
+def survey_row(rng, token, created_at):
+    return {
+        "id": str(uuid.uuid4()),
+        "token": token,
+        "liquor_preferences": ", ".join(rng.sample(LIQUOR_CHOICES, rng.randint(1, 3))),
+        "event_preferences": ", ".join(rng.sample(EVENT_CHOICES, rng.randint(1, 4))),
+        "arrival_window": rng.choice(ARRIVAL_WINDOWS),
+        "budget_preference": rng.choice(BUDGETS),
+        "email": f"{token}@example.com",
+        "notify_opt_in": rng.random() < 0.7,
+        "passport_confirmed": rng.random() < 0.5,
+        "attendance_likelihood": rng.randint(1, 5),
+        "created_at": created_at,
+    }
+
+
+def seed_tables(invites, surveys, events, seed):
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    tables = {name: [] for name in SCHEMA_TABLES}
+    tokens = {stage: [] for stage in STAGES if stage != "admin"}
+    for idx in range(invites):
+        token = f"guest{idx:06d}"
+        stage = ("name_gate", "rsvp_gate", "hub")[idx % 3]
+        created_at = (start + timedelta(minutes=idx)).isoformat()
+        invite = {
+            "id": str(uuid.uuid4()),
+            "token": token,
+            "guest_name": f"Guest {idx}",
+            "video_url": "welcome.mp4",
+            "needs_passport": idx % 4 == 0,
+            "home_city": rng.choice(["Nashville", "Houston", "Dallas", "Orlando"]),
+            "gate_name_done": stage != "name_gate",
+            "gate_video_done": stage == "hub",
+            "rsvp_choice": "yes" if stage == "hub" else None,
+            "rsvp_done": stage == "hub",
+            "survey_done": stage == "hub",
+            "created_at": created_at,
+        }
+        tables["invites"].append(invite)
+        tokens[stage].append(token)
+    hub_tokens = tokens["hub"] or [row["token"] for row in tables["invites"]]
+    for idx in range(surveys):
+        created_at = (start + timedelta(seconds=idx)).isoformat()
+        tables["survey_responses"].append(survey_row(rng, hub_tokens[idx % len(hub_tokens)], created_at))
+    first_day = date(2026, 6, 11)
+    for idx in range(events):
+        tables["trip_events"].append(
+            {
+                "id": str(uuid.uuid4()),
+                "title": f"Event {idx}",
+                "event_date": (first_day + timedelta(days=idx % 7)).isoformat(),
+                "event_time": f"{9 + idx % 12:02d}:00:00",
+                "location": "Tamarindo",
+                "description": "Planned activity",
+                "bring_items": "Sunscreen, Water, Hat",
+                "created_at": (start + timedelta(hours=idx)).isoformat(),
+            }
+        )
+    return tables, tokens
+
+
+def summarize(samples, db_calls):
+    latencies = [sample["ms"] for sample in samples]
+    return {
+        "renders": len(samples),
+        "errors": sum(sample["error"] for sample in samples),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies) if latencies else None,
+        "db_calls_per_render": db_calls / len(samples) if samples else None,
+        "bytes_per_render": sum(sample["bytes"] for sample in samples) / len(samples) if samples else None,
+    }
+
+
+def admin_link_token():
+    import streamlit as st
+
+    try:
+        return st.secrets.get("ADMIN_LINK_TOKEN", ADMIN_TOKEN)
+    except Exception:
+        return ADMIN_TOKEN
+
+
+def server_stats(db, conn, tracing):
+    while conn.recv() == "stats":
+        with db.lock:
+            report = {
+                "db_operations": dict(sorted(db.by_operation.items())),
+                "db_calls_by_session": dict(db.by_session),
+            }
+        report["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        report["peak_traced_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024) if tracing else None
+        conn.send(report)
+
+
+def serve(args, port, conn):
+    sys.path.insert(0, APP_DIR)
+    os.chdir(APP_DIR)
+    import supabase_client
+    from streamlit.web import bootstrap
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    sys.stdout = open(os.devnull, "w")
+    tables, tokens = seed_tables(args.invites, args.surveys, args.events, args.seed)
+    db = MemorySupabase(tables, args.db_latency_ms / 1000)
+    supabase_client.get_supabase_client = lambda: db
+    os.environ["ADMIN_LINK_TOKEN"] = ADMIN_TOKEN
+    flags = {
+        "server_port": port,
+        "server_address": "127.0.0.1",
+        "server_headless": True,
+        "server_fileWatcherType": "none",
+        "server_runOnSave": False,
+        "browser_gatherUsageStats": False,
+        "logger_level": "error",
+    }
+    bootstrap.load_config_options(flags)
+    conn.send({"tokens": tokens, "admin_token": admin_link_token()})
+    if args.tracemalloc:
+        tracemalloc.start()
+    threading.Thread(target=server_stats, args=(db, conn, args.tracemalloc), daemon=True).start()
+    bootstrap.run(APP_PATH, False, [], flags)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_server(port, process):
+    deadline = time.monotonic() + SERVER_START_SECONDS
+    while time.monotonic() < deadline:
+        if not process.is_alive():
+            raise RuntimeError("Streamlit server exited during startup")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as res:
+                if res.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Streamlit server did not start within {SERVER_START_SECONDS}s")
+
+
+async def render(ws, query, cached):
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    back = BackMsg()
+    back.rerun_script.query_string = query
+    back.rerun_script.cached_message_hashes.extend(cached)
+    begin = time.perf_counter()
+    await ws.send(back.SerializeToString())
+    received = 0
+    error = False
+    session_id = None
+    while True:
+        raw = await ws.recv()
+        received += len(raw)
+        msg = ForwardMsg()
+        msg.ParseFromString(raw)
+        kind = msg.WhichOneof("type")
+        if msg.metadata.cacheable:
+            cached.add(msg.hash)
+        if kind == "new_session" and msg.new_session.HasField("initialize"):
+            session_id = msg.new_session.initialize.session_id
+        elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+            error = error or msg.delta.new_element.WhichOneof("type") == "exception"
+        elif kind == "script_finished" and msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+            error = error or msg.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR
+            break
+    return session_id, {"ms": (time.perf_counter() - begin) * 1000, "bytes": received, "error": error}
+
+
+async def drive_session(url, stage, query, rounds):
+    from websockets.asyncio.client import connect
+
+    samples = []
+    session_id = None
+    cached = set()
+    try:
+        async with connect(url, subprotocols=["streamlit"], max_size=None, open_timeout=SERVER_START_SECONDS) as ws:
+            for _ in range(rounds):
+                new_id, sample = await render(ws, query, cached)
+                session_id = session_id or new_id
+                samples.append({"stage": stage, **sample})
+    except Exception:
+        samples.append({"stage": stage, "ms": 0.0, "bytes": 0, "error": True})
+    return stage, session_id, samples
+
+
+async def drive_sessions(port, plan, rounds):
+    url = f"ws://127.0.0.1:{port}/_stcore/stream"
+    return await asyncio.gather(*(drive_session(url, stage, query, rounds) for stage, query in plan))
+
+
+def session_plan(args, tokens, admin_token):
+    rng = random.Random(args.seed)
+    plan = []
+    for stage in STAGES:
+        for _ in range(getattr(args, stage)):
+            if stage == "admin":
+                plan.append((stage, urlencode({"admin": admin_token})))
+            else:
+                plan.append((stage, urlencode({"t": rng.choice(tokens[stage])})))
+    return plan
+
+
+def run_load(args):
+    port = args.port or free_port()
+    context = multiprocessing.get_context("spawn")
+    conn, child_conn = context.Pipe()
+    server = context.Process(target=serve, args=(args, port, child_conn), daemon=True)
+    server.start()
+    try:
+        setup = conn.recv()
+        wait_for_server(port, server)
+        plan = session_plan(args, setup["tokens"], setup["admin_token"])
+        started = time.perf_counter()
+        results = asyncio.run(drive_sessions(port, plan, args.rounds))
+        elapsed = time.perf_counter() - started
+        conn.send("stats")
+        stats = conn.recv()
+    finally:
+        server.terminate()
+        server.join()
+    samples = [sample for _, _, session_samples in results for sample in session_samples]
+    calls = stats["db_calls_by_session"]
+    stage_calls = {stage: 0 for stage in STAGES}
+    for stage, session_id, _ in results:
+        stage_calls[stage] += calls.get(session_id, 0)
+    return {
+        "config": vars(args),
+        "sessions": len(plan),
+        "elapsed_seconds": elapsed,
+        "renders_per_second": len(samples) / elapsed if elapsed else None,
+        "overall": summarize(samples, sum(stage_calls.values())),
+        "stages": {
+            stage: summarize([s for s in samples if s["stage"] == stage], stage_calls[stage])
+            for stage in STAGES
+            if getattr(args, stage)
+        },
+        "background_db_calls": calls.get("background", 0),
+        "db_operations": stats["db_operations"],
+        "peak_rss_mb": stats["peak_rss_mb"],
+        "peak_traced_mb": stats["peak_traced_mb"],
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load a local Streamlit server running app.py against an in-memory Supabase.")
+    parser.add_argument("--name-gate", dest="name_gate", type=int, default=10, help="sessions at the name gate")
+    parser.add_argument("--rsvp-gate", dest="rsvp_gate", type=int, default=10, help="sessions at the RSVP gate")
+    parser.add_argument("--hub", type=int, default=20, help="sessions on the guest hub")
+    parser.add_argument("--admin", type=int, default=2, help="admin dashboard sessions")
+    parser.add_argument("--rounds", type=int, default=5, help="reruns per session")
+    parser.add_argument("--invites", type=int, default=300)
+    parser.add_argument("--surveys", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=40)
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="simulated round trip per query")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--port", type=int, help="server port (default: a free local port)")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the server's traced Python heap peak")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = json.dumps(run_load(args), indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(report + "\n")
+    else:
+        print(report)
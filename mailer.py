@@ -0,0 +1,111 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from metrics import requests_response_hook
+
+
+MAILGUN_API_BASE = "https://api.mailgun.net/v3"
+MAILGUN_BATCH_LIMIT = 1000
+MAILGUN_MAX_WORKERS = 4
+MAILGUN_MAX_ATTEMPTS = 4
+MAILGUN_BACKOFF_SECONDS = 1.0
+MAILGUN_TIMEOUT_SECONDS = 20
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_mailgun_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAILGUN_MAX_WORKERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.hooks["response"].append(requests_response_hook)
+            _session = session
+        return _session
+
+
+def unique_recipients(recipients):
+    seen = set()
+    result = []
+    for email in recipients:
+        cleaned = (email or "").strip()
+        if cleaned and cleaned.lower() not in seen:
+            seen.add(cleaned.lower())
+            result.append(cleaned)
+    return result
+
+
+def chunked(items, size):
+    return [items[idx:idx + size] for idx in range(0, len(items), size)]
+
+
+def backoff_delay(attempt):
+    return MAILGUN_BACKOFF_SECONDS * (2 ** attempt) * (0.5 + random.random() / 2)
+
+
+def post_batch(session, api_base, domain, api_key, from_email, batch, subject, content):
+    recipient_variables = {email: {"email": email} for email in batch}
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            response = session.post(
+                f"{api_base}/{domain}/messages",
+                auth=HTTPBasicAuth("api", api_key),
+                data={
+                    "from": from_email,
+                    "to": batch,
+                    "subject": subject,
+                    "text": content,
+                    "recipient-variables": json.dumps(recipient_variables),
+                },
+                timeout=MAILGUN_TIMEOUT_SECONDS,
+            )
+        except requests.RequestException as exc:
+            error = str(exc)
+            transient = True
+        else:
+            if response.status_code < 400:
+                try:
+                    message_id = response.json().get("id")
+                except ValueError:
+                    message_id = None
+                return {
+                    email: {"status": "sent", "attempts": attempt, "id": message_id, "error": None}
+                    for email in batch
+                }
+            error = f"{response.status_code}: {response.text}"
+            transient = response.status_code in TRANSIENT_STATUS_CODES
+        if not transient or attempt >= MAILGUN_MAX_ATTEMPTS:
+            return {
+                email: {"status": "failed", "attempts": attempt, "id": None, "error": error}
+                for email in batch
+            }
+        time.sleep(backoff_delay(attempt - 1))
+
+
+def send_mailgun_batches(recipients, subject, content, api_key, domain, from_email, api_base=None, session=None):
+    api_base = (api_base or MAILGUN_API_BASE).rstrip("/")
+    session = session or get_mailgun_session()
+    batches = chunked(unique_recipients(recipients), MAILGUN_BATCH_LIMIT)
+    report = {}
+    if not batches:
+        return report
+    with ThreadPoolExecutor(max_workers=min(MAILGUN_MAX_WORKERS, len(batches))) as pool:
+        futures = [
+            pool.submit(post_batch, session, api_base, domain, api_key, from_email, batch, subject, content)
+            for batch in batches
+        ]
+        for future in futures:
+            report.update(future.result())
+    return report
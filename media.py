@@ -0,0 +1,298 @@
+import os
+import shutil
+import struct
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from html import escape
+from gallery import content_hash, file_signature, temp_name
+
+
+MEDIA_DIR = "static/media"
+MEDIA_URL = "app/static/media"
+POSTER_WIDTH = 960
+MEDIA_SEARCH_DIRS = ("assets/videos", "assets/gallery")
+RESOLVE_TTL_SECONDS = 300
+PUBLISH_WORKERS = 1
+EXTENSION_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+    ".gif": "image/gif",
+    ".mp4": "video/mp4",
+    ".m4v": "video/mp4",
+    ".mov": "video/quicktime",
+    ".webm": "video/webm",
+}
+CONTAINER_ATOMS = {b"moov", b"trak", b"mdia", b"minf", b"stbl", b"edts", b"dinf", b"udta"}
+
+_published = {}
+_resolved = {}
+_pending = {}
+_failed = set()
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=PUBLISH_WORKERS, thread_name_prefix="media-publish")
+
+
+def read_atoms(data, start, end):
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", data[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise ValueError("Malformed MP4 atom")
+        yield kind, pos, size, header
+        pos += size
+
+
+def top_level_atoms(path):
+    atoms = []
+    total = os.path.getsize(path)
+    with open(path, "rb") as handle:
+        pos = 0
+        while pos + 8 <= total:
+            handle.seek(pos)
+            size, kind = struct.unpack(">I4s", handle.read(8))
+            if size == 1:
+                size = struct.unpack(">Q", handle.read(8))[0]
+            elif size == 0:
+                size = total - pos
+            if size < 8:
+                raise ValueError("Malformed MP4 atom")
+            atoms.append((kind, pos, size))
+            pos += size
+    return atoms
+
+
+def needs_faststart(path):
+    kinds = [kind for kind, _, _ in top_level_atoms(path)]
+    if b"moov" not in kinds or b"mdat" not in kinds:
+        return False
+    return kinds.index(b"moov") > kinds.index(b"mdat")
+
+
+def shift_chunk_offsets(moov, old_moov_offset, delta):
+    moov = bytearray(moov)
+
+    def walk(start, end):
+        for kind, pos, size, header in read_atoms(moov, start, end):
+            body = pos + header
+            if kind in CONTAINER_ATOMS:
+                walk(body, pos + size)
+            elif kind == b"stco":
+                count = struct.unpack(">I", moov[body + 4:body + 8])[0]
+                for idx in range(count):
+                    at = body + 8 + idx * 4
+                    offset = struct.unpack(">I", moov[at:at + 4])[0]
+                    if offset < old_moov_offset:
+                        offset += delta
+                    if offset > 0xFFFFFFFF:
+                        raise ValueError("Chunk offset overflow")
+                    moov[at:at + 4] = struct.pack(">I", offset)
+            elif kind == b"co64":
+                count = struct.unpack(">I", moov[body + 4:body + 8])[0]
+                for idx in range(count):
+                    at = body + 8 + idx * 8
+                    offset = struct.unpack(">Q", moov[at:at + 8])[0]
+                    if offset < old_moov_offset:
+                        offset += delta
+                    moov[at:at + 8] = struct.pack(">Q", offset)
+
+    walk(0, len(moov))
+    return bytes(moov)
+
+
+def write_faststart(source, target):
+    atoms = top_level_atoms(source)
+    moov_atom = next(atom for atom in atoms if atom[0] == b"moov")
+    with open(source, "rb") as handle:
+        handle.seek(moov_atom[1])
+        moov = shift_chunk_offsets(handle.read(moov_atom[2]), moov_atom[1], moov_atom[2])
+        others = [atom for atom in atoms if atom[0] != b"moov"]
+        first_mdat = next(idx for idx, atom in enumerate(others) if atom[0] == b"mdat")
+        with open(target, "wb") as out:
+            for idx, (_, pos, size) in enumerate(others):
+                if idx == first_mdat:
+                    out.write(moov)
+                handle.seek(pos)
+                remaining = size
+                while remaining:
+                    block = handle.read(min(remaining, 1024 * 1024))
+                    out.write(block)
+                    remaining -= len(block)
+
+
+def write_poster(source, target):
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        return False
+    temp_path = temp_name(target) + ".jpg"
+    try:
+        subprocess.run(
+            [ffmpeg, "-y", "-loglevel", "error", "-ss", "0.5", "-i", source,
+             "-frames:v", "1", "-vf", f"scale={POSTER_WIDTH}:-2", temp_path],
+            check=True,
+            timeout=60,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return False
+    os.replace(temp_path, target)
+    return True
+
+
+def publish_media(path, is_video):
+    signature = file_signature(path)
+    with _lock:
+        cached = _published.get(signature)
+    if cached:
+        return cached
+    key = content_hash(path)
+    ext = os.path.splitext(path)[1].lower()
+    os.makedirs(MEDIA_DIR, exist_ok=True)
+    name = f"{key}{ext}"
+    target = os.path.join(MEDIA_DIR, name)
+    if not os.path.exists(target):
+        temp_path = temp_name(target)
+        try:
+            if is_video and needs_faststart(path):
+                write_faststart(path, temp_path)
+            else:
+                shutil.copyfile(path, temp_path)
+        except (ValueError, StopIteration, struct.error):
+            shutil.copyfile(path, temp_path)
+        os.replace(temp_path, target)
+    poster = None
+    if is_video:
+        poster_name = f"{key}-poster.jpg"
+        poster_target = os.path.join(MEDIA_DIR, poster_name)
+        if os.path.exists(poster_target) or write_poster(target, poster_target):
+            poster = f"{MEDIA_URL}/{poster_name}"
+    result = {"url": f"{MEDIA_URL}/{name}", "poster": poster, "bytes": os.path.getsize(target)}
+    with _lock:
+        _published[signature] = result
+    return result
+
+
+def finish_publish(signature, future):
+    with _lock:
+        _pending.pop(signature, None)
+        if future.exception() is not None:
+            _failed.add(signature)
+
+
+def schedule_publish(path, is_video):
+    signature = file_signature(path)
+    with _lock:
+        cached = _published.get(signature)
+        if cached or signature in _pending or signature in _failed:
+            return cached
+        future = _executor.submit(publish_media, path, is_video)
+        _pending[signature] = future
+    future.add_done_callback(partial(finish_publish, signature))
+    return None
+
+
+def publish_failed(path):
+    signature = file_signature(path)
+    with _lock:
+        return signature in _failed
+
+
+def video_html(url, poster=None, mime="video/mp4"):
+    poster_attr = f" poster='{escape(poster)}'" if poster else ""
+    return (
+        f"<video controls playsinline preload='metadata'{poster_attr} style='width:100%;height:auto'>"
+        f"<source src='{escape(url)}' type='{mime}'>"
+        f"</video>"
+    )
+
+
+def image_html(url, alt=""):
+    return f"<img src='{escape(url)}' alt='{escape(alt)}' style='width:100%;height:auto'>"
+
+
+def sniff_mime(path):
+    with open(path, "rb") as handle:
+        head = handle.read(16)
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video/webm"
+    if head[4:8] == b"ftyp":
+        return "video/quicktime" if head[8:12] == b"qt  " else "video/mp4"
+    return None
+
+
+def guess_mime(name):
+    return EXTENSION_TYPES.get(os.path.splitext(name.split("?")[0])[1].lower())
+
+
+def find_local_media(video_url):
+    if os.path.isabs(video_url):
+        return video_url if os.path.isfile(video_url) else None
+    for directory in MEDIA_SEARCH_DIRS:
+        candidate = os.path.join(directory, video_url)
+        if os.path.isfile(candidate):
+            return candidate
+    return video_url if os.path.isfile(video_url) else None
+
+
+def build_media(video_url):
+    media = {
+        "source": video_url,
+        "remote": False,
+        "missing": False,
+        "path": None,
+        "url": None,
+        "poster": None,
+        "bytes": None,
+        "pending": False,
+    }
+    if video_url.startswith(("http://", "https://")):
+        mime = guess_mime(video_url) or "video/mp4"
+        media.update(remote=True, url=video_url, mime=mime, kind=mime.split("/")[0])
+        return media
+    path = find_local_media(video_url)
+    if not path:
+        mime = guess_mime(video_url) or "video/mp4"
+        media.update(missing=True, mime=mime, kind=mime.split("/")[0])
+        return media
+    mime = sniff_mime(path) or guess_mime(path) or "application/octet-stream"
+    kind = mime.split("/")[0] if mime.startswith(("image/", "video/")) else "video"
+    media.update(path=path, mime=mime, kind=kind, bytes=os.path.getsize(path))
+    try:
+        published = schedule_publish(path, kind == "video")
+        if published is None:
+            media["pending"] = not publish_failed(path)
+            return media
+    except OSError:
+        return media
+    media.update(url=published["url"], poster=published["poster"])
+    return media
+
+
+def resolve_media(video_url):
+    now = time.monotonic()
+    with _lock:
+        cached = _resolved.get(video_url)
+    if cached and now - cached[0] < RESOLVE_TTL_SECONDS:
+        return cached[1]
+    media = build_media(video_url)
+    if not media["pending"]:
+        with _lock:
+            _resolved[video_url] = (now, media)
+    return media
@@ -0,0 +1,171 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+METRICS_WINDOW = 2000
+SLOW_RENDER_LIMIT = 10
+QUERY_WRITE_METHODS = {"insert", "upsert", "update", "delete"}
+
+logger = logging.getLogger("perf")
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class MetricsStore:
+    def __init__(self, window=METRICS_WINDOW):
+        self.lock = threading.Lock()
+        self.samples = deque(maxlen=window)
+
+    def record(self, kind, name, ms, **fields):
+        sample = {"kind": kind, "name": name, "ms": round(ms, 2), "at": time.time(), **fields}
+        with self.lock:
+            self.samples.append(sample)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(sample, default=str))
+        return sample
+
+    def snapshot(self, kind=None):
+        with self.lock:
+            samples = list(self.samples)
+        if kind is not None:
+            samples = [sample for sample in samples if sample["kind"] == kind]
+        return samples
+
+    def summary(self):
+        groups = {}
+        for sample in self.snapshot():
+            groups.setdefault((sample["kind"], sample["name"]), []).append(sample["ms"])
+        rows = []
+        for (kind, name), values in groups.items():
+            rows.append(
+                {
+                    "kind": kind,
+                    "name": name,
+                    "count": len(values),
+                    "p50_ms": percentile(values, 50),
+                    "p95_ms": percentile(values, 95),
+                    "p99_ms": percentile(values, 99),
+                    "max_ms": max(values),
+                }
+            )
+        return sorted(rows, key=lambda row: row["p95_ms"], reverse=True)
+
+    def slowest(self, kind="render", limit=SLOW_RENDER_LIMIT):
+        return sorted(self.snapshot(kind), key=lambda sample: sample["ms"], reverse=True)[:limit]
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+
+METRICS = MetricsStore()
+
+
+@contextmanager
+def timed(kind, name, **fields):
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        name = fields.pop("name", name)
+        METRICS.record(kind, name, (time.perf_counter() - start) * 1000, **fields)
+
+
+class SectionTimer:
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        METRICS.record("section", f"{self.prefix}.{name}", (now - self.last) * 1000)
+        self.last = now
+
+
+class InstrumentedQuery:
+    def __init__(self, query, table, op="select"):
+        self.query = query
+        self.table = table
+        self.op = op
+
+    def __getattr__(self, attr):
+        target = getattr(self.query, attr)
+        if not callable(target):
+            return InstrumentedQuery(target, self.table, self.op) if hasattr(target, "execute") else target
+
+        def call(*args, **kwargs):
+            result = target(*args, **kwargs)
+            op = attr if attr in QUERY_WRITE_METHODS else self.op
+            return InstrumentedQuery(result, self.table, op)
+
+        return call
+
+    def execute(self):
+        start = time.perf_counter()
+        rows = None
+        error = None
+        try:
+            res = self.query.execute()
+            data = getattr(res, "data", None)
+            rows = len(data) if isinstance(data, list) else int(data is not None)
+            return res
+        except Exception as exc:
+            error = type(exc).__name__
+            raise
+        finally:
+            METRICS.record(
+                "db",
+                f"{self.table}.{self.op}",
+                (time.perf_counter() - start) * 1000,
+                rows=rows,
+                error=error,
+            )
+
+
+class InstrumentedClient:
+    def __init__(self, client):
+        self.client = client
+
+    def table(self, name):
+        return InstrumentedQuery(self.client.table(name), name)
+
+    def rpc(self, fn, params=None, **kwargs):
+        return InstrumentedQuery(self.client.rpc(fn, params or {}, **kwargs), "rpc", fn)
+
+    def __getattr__(self, attr):
+        return getattr(self.client, attr)
+
+
+def record_http(method, url, status, ms):
+    host = urlparse(str(url)).netloc
+    METRICS.record("http", f"{method} {host}", ms, status=status)
+
+
+def httpx_event_hooks():
+    def on_request(request):
+        request.extensions["perf_start"] = time.perf_counter()
+
+    def on_response(response):
+        start = response.request.extensions.get("perf_start")
+        if start is not None:
+            ms = (time.perf_counter() - start) * 1000
+            record_http(response.request.method, response.request.url, response.status_code, ms)
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def requests_response_hook(response, *args, **kwargs):
+    record_http(response.request.method, response.url, response.status_code, response.elapsed.total_seconds() * 1000)
@@ -0,0 +1,186 @@
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from mailer import send_mailgun_batches, unique_recipients
+from supabase_client import is_missing_function
+
+
+OUTBOX_TABLE = "email_outbox"
+OUTBOX_POLL_SECONDS = 5
+OUTBOX_CLAIM_LIMIT = 200
+OUTBOX_RATE_PER_MINUTE = 300
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_SECONDS = 60
+OUTBOX_STALE_SECONDS = 600
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+def idempotency_key(recipient, message_key):
+    raw = f"{recipient.strip().lower()}|{message_key}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def enqueue_emails(supabase, recipients, subject, content, message_key):
+    rows = [
+        {
+            "idempotency_key": idempotency_key(email, message_key),
+            "message_key": message_key,
+            "recipient": email,
+            "subject": subject,
+            "body": content,
+        }
+        for email in unique_recipients(recipients)
+    ]
+    if not rows:
+        return 0
+    res = supabase.table(OUTBOX_TABLE).upsert(
+        rows, on_conflict="idempotency_key", ignore_duplicates=True
+    ).execute()
+    return len(res.data or [])
+
+
+class RateLimiter:
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute
+        self.next_at = 0.0
+
+    def wait(self, count):
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = now + count * self.interval
+
+
+class OutboxWorker:
+    def __init__(self):
+        self.client = None
+        self.settings = None
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.limiter = RateLimiter(OUTBOX_RATE_PER_MINUTE)
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.errors = 0
+        self.last_error = None
+        self.thread = threading.Thread(target=self.run, name="email-outbox-worker", daemon=True)
+        self.thread.start()
+
+    def configure(self, client, settings):
+        self.client = client
+        self.settings = settings
+
+    def notify(self):
+        self.wake.set()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake.set()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            self.wake.wait(OUTBOX_POLL_SECONDS)
+            self.wake.clear()
+            if self.client is None or not self.settings:
+                continue
+            try:
+                self.drain()
+            except Exception as exc:
+                with self.lock:
+                    self.errors += 1
+                    self.last_error = str(exc)
+
+    def drain(self):
+        while not self.stop_event.is_set():
+            rows = self.claim()
+            if not rows:
+                return
+            self.deliver(rows)
+
+    def claim(self):
+        try:
+            res = self.client.rpc("claim_email_outbox", {"p_limit": OUTBOX_CLAIM_LIMIT}).execute()
+            return res.data or []
+        except Exception as exc:
+            if not is_missing_function(exc):
+                raise
+        now = utc_now()
+        stale = now - timedelta(seconds=OUTBOX_STALE_SECONDS)
+        res = (
+            self.client.table(OUTBOX_TABLE)
+            .select("*")
+            .or_(
+                f'and(status.eq.pending,available_at.lte."{now.isoformat()}"),'
+                f'and(status.eq.sending,claimed_at.lt."{stale.isoformat()}")'
+            )
+            .order("created_at")
+            .limit(OUTBOX_CLAIM_LIMIT)
+            .execute()
+        )
+        claimed = []
+        for row in res.data or []:
+            attempts = (row.get("attempts") or 0) + 1
+            query = (
+                self.client.table(OUTBOX_TABLE)
+                .update({"status": "sending", "attempts": attempts, "claimed_at": utc_now().isoformat()})
+                .eq("id", row["id"])
+                .eq("status", row["status"])
+            )
+            if row["status"] == "sending":
+                query = query.eq("claimed_at", row["claimed_at"])
+            updated = query.execute()
+            if updated.data:
+                claimed.append({**row, "attempts": attempts})
+        return claimed
+
+    def deliver(self, rows):
+        groups = {}
+        for row in rows:
+            groups.setdefault((row["subject"], row["body"]), []).append(row)
+        for (subject, body), group in groups.items():
+            self.limiter.wait(len(group))
+            report = send_mailgun_batches([row["recipient"] for row in group], subject, body, **self.settings)
+            sent_ids = []
+            for row in group:
+                result = report.get(row["recipient"]) or {"status": "failed", "error": "No delivery result"}
+                if result["status"] == "sent":
+                    sent_ids.append(row["id"])
+                else:
+                    self.mark_failed(row, result.get("error"))
+            if sent_ids:
+                self.client.table(OUTBOX_TABLE).update(
+                    {"status": "sent", "sent_at": utc_now().isoformat(), "last_error": None}
+                ).in_("id", sent_ids).execute()
+                with self.lock:
+                    self.sent += len(sent_ids)
+
+    def mark_failed(self, row, error):
+        attempts = row.get("attempts") or 1
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            payload = {"status": "failed", "last_error": error}
+            with self.lock:
+                self.failed += 1
+        else:
+            retry_at = utc_now() + timedelta(seconds=OUTBOX_RETRY_SECONDS * attempts)
+            payload = {"status": "pending", "last_error": error, "available_at": retry_at.isoformat()}
+            with self.lock:
+                self.retried += 1
+        self.client.table(OUTBOX_TABLE).update(payload).eq("id", row["id"]).execute()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "running": self.thread.is_alive(),
+                "configured": bool(self.settings),
+                "sent": self.sent,
+                "retried": self.retried,
+                "failed": self.failed,
+                "errors": self.errors,
+                "last_error": self.last_error,
+            }
@@ -1,12 +1,131 @@
 import os
+import threading
+import time
+import httpx
 import streamlit as st
-from supabase import create_client
+from supabase import ClientOptions, create_client
+from metrics import InstrumentedClient, httpx_event_hooks
+
+
+SUPABASE_POOL_SIZE = 20
+SUPABASE_KEEPALIVE_SECONDS = 60
+SUPABASE_TIMEOUT_SECONDS = 20
+SUPABASE_HEALTH_CHECK_SECONDS = 30
+SUPABASE_RETIRE_SECONDS = 2 * SUPABASE_TIMEOUT_SECONDS
+
+
+def get_setting(name, default=None):
+    return st.secrets.get(name, os.environ.get(name, default))
+
+
+def is_missing_function(exc):
+    return getattr(exc, "code", None) in {"PGRST202", "42883"}
+
+
+def is_missing_relation(exc):
+    return getattr(exc, "code", None) in {"PGRST205", "42P01"}
+
+
+class SupabasePool:
+    def __init__(self, url, key, pool_size):
+        self.url = url
+        self.key = key
+        self.pool_size = pool_size
+        self.lock = threading.Lock()
+        self.http = None
+        self.client = None
+        self.retired = []
+        self.checking = False
+        self.last_check = 0.0
+        self.reconnects = 0
+
+    def build(self):
+        http = httpx.Client(
+            http2=True,
+            follow_redirects=True,
+            timeout=SUPABASE_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size,
+                keepalive_expiry=SUPABASE_KEEPALIVE_SECONDS,
+            ),
+            event_hooks=httpx_event_hooks(),
+        )
+        client = create_client(self.url, self.key, options=ClientOptions(httpx_client=http))
+        return http, InstrumentedClient(client)
+
+    def connect(self):
+        self.http, self.client = self.build()
+        self.last_check = time.monotonic()
+
+    def close_retired(self, now):
+        keep = []
+        for http, retired_at in self.retired:
+            if now - retired_at < SUPABASE_RETIRE_SECONDS:
+                keep.append((http, retired_at))
+                continue
+            try:
+                http.close()
+            except Exception:
+                pass
+        self.retired = keep
+
+    def ping(self, client):
+        try:
+            client.table("invites").select("token").limit(1).execute()
+        except Exception:
+            return False
+        return True
+
+    def check(self, client):
+        replacement = None
+        try:
+            if not self.ping(client):
+                replacement = self.build()
+        finally:
+            with self.lock:
+                now = time.monotonic()
+                self.checking = False
+                self.last_check = now
+                if replacement is not None:
+                    self.retired.append((self.http, now))
+                    self.http, self.client = replacement
+                    self.reconnects += 1
+                self.close_retired(now)
+
+    def mark_failed(self):
+        self.last_check = 0.0
+
+    def get(self):
+        with self.lock:
+            if self.client is None:
+                self.connect()
+            elif not self.checking and time.monotonic() - self.last_check > SUPABASE_HEALTH_CHECK_SECONDS:
+                self.checking = True
+                threading.Thread(
+                    target=self.check, args=(self.client,), name="supabase-health-check", daemon=True
+                ).start()
+            return self.client
+
+
+@st.cache_resource(show_spinner=False)
+def get_supabase_pool(url, key, pool_size):
+    return SupabasePool(url, key, pool_size)
 
 
 def get_supabase_client():
-    url = st.secrets.get("SUPABASE_URL", os.environ.get("SUPABASE_URL"))
-    key = st.secrets.get("SUPABASE_SERVICE_ROLE_KEY", os.environ.get("SUPABASE_SERVICE_ROLE_KEY"))
+    url = get_setting("SUPABASE_URL")
+    key = get_setting("SUPABASE_SERVICE_ROLE_KEY")
     if not url or not key:
         st.error("Missing Supabase credentials. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY in secrets.")
         st.stop()
-    return create_client(url, key)
+    pool_size = int(get_setting("SUPABASE_POOL_SIZE", SUPABASE_POOL_SIZE))
+    return get_supabase_pool(url, key, pool_size).get()
+
+
+def mark_supabase_failed():
+    url = get_setting("SUPABASE_URL")
+    key = get_setting("SUPABASE_SERVICE_ROLE_KEY")
+    if url and key:
+        pool_size = int(get_setting("SUPABASE_POOL_SIZE", SUPABASE_POOL_SIZE))
+        get_supabase_pool(url, key, pool_size).mark_failed()
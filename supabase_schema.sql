@@ -54,15 +54,329 @@ create table if not exists public.trip_events (
   updated_at timestamp with time zone default now()
 );
 
+-- Durable email outbox drained by the background worker
+create table if not exists public.email_outbox (
+  id uuid primary key default gen_random_uuid(),
+  idempotency_key text not null unique,
+  message_key text not null,
+  recipient text not null,
+  subject text not null,
+  body text not null,
+  status text not null default 'pending',
+  attempts integer not null default 0,
+  last_error text,
+  available_at timestamp with time zone default now(),
+  claimed_at timestamp with time zone,
+  sent_at timestamp with time zone,
+  created_at timestamp with time zone default now()
+);
+
+-- Write-time RSVP and survey counters (single row, maintained by triggers)
+create table if not exists public.invite_stats (
+  id integer primary key default 1 check (id = 1),
+  invites bigint not null default 0,
+  rsvp_yes bigint not null default 0,
+  rsvp_no bigint not null default 0,
+  surveys bigint not null default 0,
+  opt_ins bigint not null default 0,
+  passports_confirmed bigint not null default 0,
+  version bigint not null default 0,
+  updated_at timestamp with time zone default now()
+);
+
+alter table public.invite_stats add column if not exists version bigint not null default 0;
+
+-- One row per multi-select survey answer (liquor/events), kept in sync by trigger
+create table if not exists public.survey_choices (
+  survey_id uuid references public.survey_responses(id) on delete cascade,
+  token text references public.invites(token) on delete cascade,
+  question text not null check (question in ('liquor', 'events')),
+  choice text not null,
+  primary key (survey_id, question, choice)
+);
+
 create index if not exists idx_survey_token on public.survey_responses(token);
+create index if not exists idx_survey_token_latest on public.survey_responses(token, created_at desc);
 create index if not exists idx_events_token on public.invite_events(token);
 create index if not exists idx_trip_events_date on public.trip_events(event_date);
+create index if not exists idx_invites_created_token on public.invites(created_at desc, token desc);
+create index if not exists idx_survey_created_id on public.survey_responses(created_at desc, id desc);
+create extension if not exists pg_trgm;
+create index if not exists idx_invites_guest_name_trgm on public.invites using gin (guest_name gin_trgm_ops);
+create index if not exists idx_email_outbox_status on public.email_outbox(status, available_at);
+create index if not exists idx_survey_choices_choice on public.survey_choices(question, choice);
+create index if not exists idx_survey_choices_token on public.survey_choices(token);
+
+-- Distinct, normalized opt-in emails using each guest's latest survey row with an email
+create or replace view public.notification_recipients as
+select distinct lower(trim(latest.email)) as email
+from (
+  select distinct on (token) token, email, notify_opt_in
+  from public.survey_responses
+  where email is not null and trim(email) <> ''
+  order by token, created_at desc
+) as latest
+where latest.notify_opt_in;
+
+-- Gate, RSVP and survey transitions in one round trip
+create or replace function public.apply_invite_transition(
+  p_token text,
+  p_changes jsonb,
+  p_event_type text default null,
+  p_detail text default '',
+  p_survey jsonb default null
+)
+returns public.invites
+language plpgsql
+as $$
+declare
+  result public.invites;
+begin
+  if p_survey is not null then
+    insert into public.survey_responses (
+      token, liquor_preferences, event_preferences, arrival_window, budget_preference,
+      passport_confirmed, attendance_likelihood, email, notify_opt_in, notes
+    )
+    select
+      p_token, r.liquor_preferences, r.event_preferences, r.arrival_window, r.budget_preference,
+      coalesce(r.passport_confirmed, false), r.attendance_likelihood, r.email,
+      coalesce(r.notify_opt_in, false), r.notes
+    from jsonb_populate_record(null::public.survey_responses, p_survey) as r;
+  end if;
+
+  update public.invites as i
+  set (guest_name, flight_origin, gate_name_done, gate_video_done, rsvp_choice, rsvp_done, survey_done, updated_at) = (
+    select r.guest_name, r.flight_origin, r.gate_name_done, r.gate_video_done, r.rsvp_choice, r.rsvp_done, r.survey_done, now()
+    from jsonb_populate_record(i, coalesce(p_changes, '{}'::jsonb)) as r
+  )
+  where i.token = p_token
+  returning i.* into result;
+
+  if p_event_type is not null then
+    insert into public.invite_events (token, event_type, detail)
+    values (p_token, p_event_type, coalesce(p_detail, ''));
+  end if;
+
+  return result;
+end;
+$$;
+
+-- Claim a batch of outbox rows; stale "sending" rows are reclaimed after a crash
+create or replace function public.claim_email_outbox(p_limit integer default 200)
+returns setof public.email_outbox
+language sql
+as $$
+  update public.email_outbox as o
+  set status = 'sending', attempts = o.attempts + 1, claimed_at = now()
+  where o.id in (
+    select id from public.email_outbox
+    where (status = 'pending' and available_at <= now())
+       or (status = 'sending' and claimed_at < now() - interval '10 minutes')
+    order by created_at
+    limit p_limit
+    for update skip locked
+  )
+  returning o.*;
+$$;
+
+-- Admin dashboard counts and chart histograms computed in the database
+create or replace function public.admin_dashboard_stats()
+returns jsonb
+language sql
+stable
+as $$
+  with histogram(name, value, count) as (
+    select 'rsvp_counts', coalesce(rsvp_choice, 'pending'), count(*) from public.invites group by 2
+    union all
+    select question, choice, count(*) from public.survey_choices group by 1, 2
+    union all
+    select 'arrival', coalesce(arrival_window, 'Unknown'), count(*) from public.survey_responses group by 2
+    union all
+    select 'budget', coalesce(budget_preference, 'Unknown'), count(*) from public.survey_responses group by 2
+  )
+  select jsonb_build_object(
+    'invites', (select count(*) from public.invites),
+    'rsvp_yes', (select count(*) from public.invites where rsvp_choice = 'yes'),
+    'rsvp_no', (select count(*) from public.invites where rsvp_choice = 'no'),
+    'surveys', (select count(*) from public.survey_responses),
+    'opt_ins', (select count(*) from public.survey_responses where notify_opt_in),
+    'passports_confirmed', (select count(*) from public.survey_responses where passport_confirmed),
+    'rsvp_counts', coalesce((select jsonb_agg(jsonb_build_object('value', value, 'count', count) order by count desc) from histogram where name = 'rsvp_counts'), '[]'::jsonb),
+    'liquor', coalesce((select jsonb_agg(jsonb_build_object('value', value, 'count', count) order by count desc) from histogram where name = 'liquor'), '[]'::jsonb),
+    'events', coalesce((select jsonb_agg(jsonb_build_object('value', value, 'count', count) order by count desc) from histogram where name = 'events'), '[]'::jsonb),
+    'arrival', coalesce((select jsonb_agg(jsonb_build_object('value', value, 'count', count) order by count desc) from histogram where name = 'arrival'), '[]'::jsonb),
+    'budget', coalesce((select jsonb_agg(jsonb_build_object('value', value, 'count', count) order by count desc) from histogram where name = 'budget'), '[]'::jsonb),
+    'likelihood', coalesce((
+      select jsonb_agg(jsonb_build_object('value', value, 'count', count) order by value)
+      from (
+        select coalesce(attendance_likelihood, 0) as value, count(*) as count
+        from public.survey_responses group by 1
+      ) as likelihood
+    ), '[]'::jsonb)
+  );
+$$;
+
+-- Recount invite_stats from the source tables
+create or replace function public.rebuild_invite_stats()
+returns public.invite_stats
+language sql
+as $$
+  insert into public.invite_stats (id, invites, rsvp_yes, rsvp_no, surveys, opt_ins, passports_confirmed, updated_at)
+  select
+    1,
+    (select count(*) from public.invites),
+    (select count(*) from public.invites where rsvp_choice = 'yes'),
+    (select count(*) from public.invites where rsvp_choice = 'no'),
+    (select count(*) from public.survey_responses),
+    (select count(*) from public.survey_responses where notify_opt_in),
+    (select count(*) from public.survey_responses where passport_confirmed),
+    now()
+  on conflict (id) do update set
+    invites = excluded.invites,
+    rsvp_yes = excluded.rsvp_yes,
+    rsvp_no = excluded.rsvp_no,
+    surveys = excluded.surveys,
+    opt_ins = excluded.opt_ins,
+    passports_confirmed = excluded.passports_confirmed,
+    version = public.invite_stats.version + 1,
+    updated_at = excluded.updated_at
+  returning *;
+$$;
+
+-- Keep invite_stats in step with invites/survey_responses writes; version moves only when a
+-- column behind the counters, charts or choice lookups changes, so those can be cached per version
+create or replace function public.track_invite_stats()
+returns trigger
+language plpgsql
+as $$
+declare
+  d_invites integer := 0;
+  d_yes integer := 0;
+  d_no integer := 0;
+  d_surveys integer := 0;
+  d_opt_ins integer := 0;
+  d_passports integer := 0;
+begin
+  if tg_table_name = 'invites' and tg_op = 'UPDATE'
+     and old.rsvp_choice is not distinct from new.rsvp_choice
+     and old.guest_name is not distinct from new.guest_name then
+    return null;
+  end if;
+
+  if tg_table_name = 'survey_responses' and tg_op = 'UPDATE'
+     and (old.token, old.liquor_preferences, old.event_preferences, old.arrival_window,
+          old.budget_preference, old.attendance_likelihood, old.notify_opt_in, old.passport_confirmed)
+         is not distinct from
+         (new.token, new.liquor_preferences, new.event_preferences, new.arrival_window,
+          new.budget_preference, new.attendance_likelihood, new.notify_opt_in, new.passport_confirmed) then
+    return null;
+  end if;
+
+  if tg_table_name = 'invites' then
+    if tg_op in ('INSERT', 'UPDATE') then
+      d_invites := d_invites + 1;
+      d_yes := d_yes + case when new.rsvp_choice = 'yes' then 1 else 0 end;
+      d_no := d_no + case when new.rsvp_choice = 'no' then 1 else 0 end;
+    end if;
+    if tg_op in ('UPDATE', 'DELETE') then
+      d_invites := d_invites - 1;
+      d_yes := d_yes - case when old.rsvp_choice = 'yes' then 1 else 0 end;
+      d_no := d_no - case when old.rsvp_choice = 'no' then 1 else 0 end;
+    end if;
+  else
+    if tg_op in ('INSERT', 'UPDATE') then
+      d_surveys := d_surveys + 1;
+      d_opt_ins := d_opt_ins + case when new.notify_opt_in then 1 else 0 end;
+      d_passports := d_passports + case when new.passport_confirmed then 1 else 0 end;
+    end if;
+    if tg_op in ('UPDATE', 'DELETE') then
+      d_surveys := d_surveys - 1;
+      d_opt_ins := d_opt_ins - case when old.notify_opt_in then 1 else 0 end;
+      d_passports := d_passports - case when old.passport_confirmed then 1 else 0 end;
+    end if;
+  end if;
+
+  if not exists (select 1 from public.invite_stats where id = 1) then
+    perform public.rebuild_invite_stats();
+    return null;
+  end if;
+
+  update public.invite_stats
+  set invites = invites + d_invites,
+      rsvp_yes = rsvp_yes + d_yes,
+      rsvp_no = rsvp_no + d_no,
+      surveys = surveys + d_surveys,
+      opt_ins = opt_ins + d_opt_ins,
+      passports_confirmed = passports_confirmed + d_passports,
+      version = version + 1,
+      updated_at = now()
+  where id = 1;
+  return null;
+end;
+$$;
+
+drop trigger if exists invites_track_stats on public.invites;
+create trigger invites_track_stats
+  after insert or update of rsvp_choice, guest_name or delete on public.invites
+  for each row execute function public.track_invite_stats();
+
+drop trigger if exists survey_track_stats on public.survey_responses;
+create trigger survey_track_stats
+  after insert or update of token, liquor_preferences, event_preferences, arrival_window,
+    budget_preference, attendance_likelihood, notify_opt_in, passport_confirmed
+    or delete on public.survey_responses
+  for each row execute function public.track_invite_stats();
+
+-- Seed invite_stats from existing rows
+select public.rebuild_invite_stats();
+
+-- Mirror the ", "-joined liquor/event answers into survey_choices
+create or replace function public.sync_survey_choices()
+returns trigger
+language plpgsql
+as $$
+begin
+  if tg_op = 'UPDATE' then
+    delete from public.survey_choices where survey_id = new.id;
+  end if;
+  insert into public.survey_choices (survey_id, token, question, choice)
+  select new.id, new.token, answers.question, answers.choice
+  from (
+    select 'liquor' as question, unnest(string_to_array(new.liquor_preferences, ', ')) as choice
+    union all
+    select 'events', unnest(string_to_array(new.event_preferences, ', '))
+  ) as answers
+  where answers.choice <> ''
+  on conflict do nothing;
+  return null;
+end;
+$$;
+
+drop trigger if exists survey_sync_choices on public.survey_responses;
+create trigger survey_sync_choices
+  after insert or update of liquor_preferences, event_preferences, token on public.survey_responses
+  for each row execute function public.sync_survey_choices();
+
+-- Backfill survey_choices for rows written before the trigger existed
+insert into public.survey_choices (survey_id, token, question, choice)
+select r.id, r.token, answers.question, answers.choice
+from public.survey_responses as r
+cross join lateral (
+  select 'liquor' as question, unnest(string_to_array(r.liquor_preferences, ', ')) as choice
+  union all
+  select 'events', unnest(string_to_array(r.event_preferences, ', '))
+) as answers
+where answers.choice <> ''
+on conflict do nothing;
 
 -- Enable RLS and allow service key access from Streamlit
 alter table public.invites enable row level security;
 alter table public.survey_responses enable row level security;
 alter table public.invite_events enable row level security;
 alter table public.trip_events enable row level security;
+alter table public.email_outbox enable row level security;
+alter table public.invite_stats enable row level security;
+alter table public.survey_choices enable row level security;
 
 -- Policies assume Streamlit uses a service role key stored in secrets
 create policy "service full access invites" on public.invites
@@ -76,3 +390,12 @@ create policy "service full access events" on public.invite_events
 
 create policy "service full access trip events" on public.trip_events
   for all using (auth.role() = 'service_role') with check (auth.role() = 'service_role');
+
+create policy "service full access email outbox" on public.email_outbox
+  for all using (auth.role() = 'service_role') with check (auth.role() = 'service_role');
+
+create policy "service full access invite stats" on public.invite_stats
+  for all using (auth.role() = 'service_role') with check (auth.role() = 'service_role');
+
+create policy "service full access survey choices" on public.survey_choices
+  for all using (auth.role() = 'service_role') with check (auth.role() = 'service_role');